@@ -3,7 +3,19 @@ Cryptography module for Ghostline Signal.
 Handles end-to-end encryption, key generation, and session key management.
 """
 
+import warnings
+
 from .keys import KeyManager
-from .encryption import MessageEncryption
+from .encryption import MessageEncryption, _has_aes_acceleration
 
 __all__ = ['KeyManager', 'MessageEncryption']
+
+
+def _check_aes_acceleration():
+    """Warn if AES-GCM would fall back to OpenSSL's slow software path."""
+    if _has_aes_acceleration() is False:
+        warnings.warn("CPU lacks AES/CLMUL instructions; encrypting with ChaCha20-Poly1305",
+                      RuntimeWarning)
+
+
+_check_aes_acceleration()
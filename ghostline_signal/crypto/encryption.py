@@ -4,63 +4,235 @@ Implements end-to-end encryption with authenticated encryption.
 """
 
 import os
-import struct
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.backends import default_backend
+import functools
+import itertools
+from typing import Iterable, List, Optional
+
+# Wire layout sizes
+_ALG_SIZE = 1      # algorithm tag
+_NONCE_SIZE = 12   # 96-bit nonce (both AEADs)
+_PREFIX_SIZE = 4   # big-endian original length before padding
+_TAG_SIZE = 16     # GCM authentication tag
+
+# Length prefix marking an unpadded (ephemeral) message
+_UNPADDED_PREFIX = b'\xff\xff\xff\xff'
+
+# Single-byte pad values, indexed by pad length (mod 256)
+_PAD_BYTE = tuple(bytes([i]) for i in range(256))
+
+
+@functools.lru_cache(maxsize=1)
+def _has_aes_acceleration() -> Optional[bool]:
+    """
+    Check whether the CPU advertises hardware AES and carry-less multiply
+    (x86: aes + pclmulqdq, ARM: aes + pmull), which OpenSSL's fast AES-GCM
+    kernels need. Returns None if the CPU flags cannot be read.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() in ('flags', 'Features'):
+                    flags = set(value.split())
+                    return 'aes' in flags and ('pclmulqdq' in flags or 'pmull' in flags)
+    except OSError:
+        pass
+    return None
+
+
+# Algorithm tags, sent as the first byte of every encrypted message
+ALG_AES_256_GCM = 0x01
+ALG_CHACHA20_POLY1305 = 0x02
+
+
+@functools.lru_cache(maxsize=1)
+def _default_algorithm() -> int:
+    """
+    Pick the AEAD this CPU runs fastest: AES-GCM when hardware AES and
+    carry-less multiply are present (or undetectable), else ChaCha20-Poly1305.
+    """
+    if _has_aes_acceleration() is False:
+        return ALG_CHACHA20_POLY1305
+    return ALG_AES_256_GCM
+
+
+@functools.lru_cache(maxsize=128)
+def _get_cipher(algorithm: int, key: bytes):
+    """Get a cached AEAD instance so the key schedule is reused per session."""
+    # Imported lazily so importing the package does not load cryptography
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+    if algorithm == ALG_AES_256_GCM:
+        return AESGCM(key)
+    if algorithm == ALG_CHACHA20_POLY1305:
+        return ChaCha20Poly1305(key)
+    raise ValueError(f"Unknown encryption algorithm: {algorithm:#04x}")
 
 
 class MessageEncryption:
-    """Handles message encryption and decryption."""
+    """
+    Handles message encryption and decryption.
 
-    @staticmethod
-    def encrypt_message(plaintext: bytes, session_key: bytes) -> bytes:
+    Messages are encrypted with AES-256-GCM, or ChaCha20-Poly1305 on CPUs
+    without AES acceleration; a leading tag byte names the algorithm so
+    either side can decrypt whatever the other chose.
+
+    Each instance owns a nonce sequence: a random 4-byte prefix drawn once
+    at construction followed by a 64-bit big-endian message counter. GCM only
+    requires nonces to be unique per key, so this avoids a getrandom() call
+    per message. Nonces never repeat within an instance; across instances
+    (and across peers sharing a session key) uniqueness relies on the random
+    prefix, so session keys must keep being rotated.
+    """
+
+    MAX_MESSAGES = 1 << 64
+
+    def __init__(self, algorithm: int = None):
+        """Initialize a fresh nonce sequence."""
+        self.algorithm = _default_algorithm() if algorithm is None else algorithm
+        self._alg_tag = bytes([self.algorithm])
+        self._nonce_prefix = os.urandom(4)
+        self._counter = itertools.count()  # next() is atomic under the GIL
+
+    def _next_nonce(self) -> bytes:
+        """Get the next unique 96-bit nonce for this instance."""
+        counter = next(self._counter)
+        if counter >= self.MAX_MESSAGES:
+            raise OverflowError("Nonce counter exhausted, create a new MessageEncryption")
+        return self._nonce_prefix + counter.to_bytes(8, 'big')
+
+    def encrypt_message(self, plaintext: bytes, session_key: bytes) -> bytes:
         """
-        Encrypt message using AES-256-GCM with the session key.
-        Returns: nonce (12 bytes) + ciphertext + tag (16 bytes)
+        Encrypt message using the instance's AEAD with the session key.
+        Returns: algorithm (1 byte) + nonce (12 bytes) + ciphertext + tag (16 bytes)
         """
-        aesgcm = AESGCM(session_key)
-        nonce = os.urandom(12)  # 96-bit nonce for GCM
+        cipher = _get_cipher(self.algorithm, bytes(session_key))
+        nonce = self._next_nonce()  # 96-bit nonce
+
+        ciphertext = cipher.encrypt(nonce, plaintext, None)
+
+        # Return algorithm + nonce + ciphertext (ciphertext includes auth tag)
+        return self._alg_tag + nonce + ciphertext
 
-        ciphertext = aesgcm.encrypt(nonce, plaintext, None)
+    def encrypt_batch(self, plaintexts: Iterable[bytes], session_key: bytes) -> List[bytes]:
+        """
+        Encrypt a burst of messages with a single cipher instance.
+        Each plaintext must stay within the GCM limit of 2^39-256 bits.
+        Returns a list in the same format as encrypt_message.
+        """
+        cipher = _get_cipher(self.algorithm, bytes(session_key))
+        next_nonce = self._next_nonce
+        alg_tag = self._alg_tag
 
-        # Return nonce + ciphertext (ciphertext includes auth tag)
-        return nonce + ciphertext
+        encrypted = []
+        for plaintext in plaintexts:
+            nonce = next_nonce()
+            encrypted.append(alg_tag + nonce + cipher.encrypt(nonce, plaintext, None))
+        return encrypted
 
     @staticmethod
     def decrypt_message(encrypted_data: bytes, session_key: bytes) -> bytes:
         """
-        Decrypt message using AES-256-GCM with the session key.
-        Expects: nonce (12 bytes) + ciphertext + tag (16 bytes)
+        Decrypt message with the session key, using the algorithm it names.
+        Expects: algorithm (1 byte) + nonce (12 bytes) + ciphertext + tag (16 bytes)
         """
-        if len(encrypted_data) < 13:  # Minimum: 12-byte nonce + 1 byte
+        # Slice through a memoryview so the ciphertext is not copied
+        view = memoryview(encrypted_data)
+        if len(view) <= _ALG_SIZE + _NONCE_SIZE:  # Minimum: tag + 12-byte nonce + 1 byte
             raise ValueError("Encrypted data too short")
 
-        nonce = encrypted_data[:12]
-        ciphertext = encrypted_data[12:]
+        nonce = bytes(view[_ALG_SIZE:_ALG_SIZE + _NONCE_SIZE])
+        ciphertext = view[_ALG_SIZE + _NONCE_SIZE:]
 
-        aesgcm = AESGCM(session_key)
-        plaintext = aesgcm.decrypt(nonce, ciphertext, None)
+        cipher = _get_cipher(view[0], bytes(session_key))
+        plaintext = cipher.decrypt(nonce, ciphertext, None)
 
         return plaintext
 
     @staticmethod
-    def add_padding(data: bytes, block_size: int = 256) -> bytes:
+    def decrypt_message_into(buf, encrypted_data: bytes, session_key: bytes) -> int:
+        """
+        Decrypt message into a caller-provided writable buffer.
+        Same input format as decrypt_message. buf must have room for the
+        ciphertext plus one AES block less a byte (len(encrypted_data) - 14
+        bytes), as update_into requires. ChaCha20-Poly1305 messages have no
+        streaming API here and are decrypted then copied into buf. Returns the
+        number of plaintext bytes written; on authentication failure
+        InvalidTag is raised and the contents written to buf must be
+        discarded.
+        """
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        view = memoryview(encrypted_data)
+        if len(view) < _ALG_SIZE + _NONCE_SIZE + _TAG_SIZE:
+            raise ValueError("Encrypted data too short")
+
+        ciphertext = view[_ALG_SIZE + _NONCE_SIZE:-_TAG_SIZE]
+        if len(buf) < len(ciphertext) + 15:
+            raise ValueError("Output buffer too small")
+
+        if view[0] != ALG_AES_256_GCM:
+            plaintext = MessageEncryption.decrypt_message(view, session_key)
+            buf[:len(plaintext)] = plaintext
+            return len(plaintext)
+
+        nonce = bytes(view[_ALG_SIZE:_ALG_SIZE + _NONCE_SIZE])
+        decryptor = Cipher(
+            algorithms.AES(bytes(session_key)),
+            modes.GCM(nonce, bytes(view[-_TAG_SIZE:]))
+        ).decryptor()
+
+        written = decryptor.update_into(ciphertext, buf)
+        decryptor.finalize()  # Verifies the tag
+        return written
+
+    @staticmethod
+    def clear_cache():
+        """Drop cached cipher instances (e.g. after session key rotation)."""
+        _get_cipher.cache_clear()
+
+    @staticmethod
+    def add_padding(data: bytes, block_size: int = 256, pad: bool = True) -> bytes:
         """
         Add padding to obscure message length.
         Uses PKCS7-style padding up to nearest block_size.
+
+        With pad=False (ephemeral control messages, only for peers that
+        understand it) the data is sent unpadded behind a 0xFFFFFFFF length
+        prefix, which leaks its exact length.
         """
+        if not pad:
+            return _UNPADDED_PREFIX + data
+
         current_len = len(data)
         target_len = ((current_len // block_size) + 1) * block_size
         padding_len = target_len - current_len
 
-        # Add length prefix (4 bytes) + data + padding
-        return struct.pack('>I', current_len) + data + (bytes([padding_len]) * padding_len)
+        # Length prefix (4 bytes) + data + padding, written into one buffer.
+        # A full block of padding (256 bytes) wraps the pad byte to 0x00.
+        buf = bytearray(_PREFIX_SIZE + target_len)
+        buf[:_PREFIX_SIZE] = current_len.to_bytes(_PREFIX_SIZE, 'big')
+        buf[_PREFIX_SIZE:_PREFIX_SIZE + current_len] = data
+
+        # The buffer starts zero-filled, so a 0x00 pad needs no second pass;
+        # otherwise single-byte repetition is one memset in CPython.
+        pad_byte = padding_len & 0xFF
+        if pad_byte:
+            buf[_PREFIX_SIZE + current_len:] = _PAD_BYTE[pad_byte] * padding_len
+        return bytes(buf)
 
     @staticmethod
     def remove_padding(padded_data: bytes) -> bytes:
         """Remove padding and extract original message."""
-        if len(padded_data) < 5:  # Minimum: 4-byte length + 1 byte
+        view = memoryview(padded_data)
+        if len(view) < _PREFIX_SIZE:
+            raise ValueError("Padded data too short")
+
+        if view[:_PREFIX_SIZE] == _UNPADDED_PREFIX:
+            return bytes(view[_PREFIX_SIZE:])
+
+        if len(view) == _PREFIX_SIZE:  # Padded minimum: 4-byte length + 1 byte
             raise ValueError("Padded data too short")
 
-        original_len = struct.unpack('>I', padded_data[:4])[0]
-        return padded_data[4:4 + original_len]
+        original_len = int.from_bytes(view[:_PREFIX_SIZE], 'big')
+        return bytes(view[_PREFIX_SIZE:_PREFIX_SIZE + original_len])
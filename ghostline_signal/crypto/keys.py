@@ -5,11 +5,82 @@ Implements local key generation with non-exportable private keys.
 
 import os
 import json
+import mmap
+import uuid
+import functools
 from pathlib import Path
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.hazmat.backends import default_backend
+from concurrent.futures import ThreadPoolExecutor
+
+# cryptography's hazmat modules are imported inside the methods that use them
+# so that importing the package (e.g. for the GUI) stays cheap.
+
+# RSA key generation releases the GIL, so running it on a worker thread
+# lets the GUI start while the primes are being searched for.
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ghostline-keygen')
+
+
+def _generate_rsa_key():
+    """Generate a new RSA private key (4096-bit for strong security)."""
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.backends import default_backend
+
+    return rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=4096,
+        backend=default_backend()
+    )
+
+
+def _serialize_private_key(private_key) -> bytes:
+    """Serialize a private key for storage on disk."""
+    from cryptography.hazmat.primitives import serialization
+
+    # DER rather than PEM: loading skips the base64 decode
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()  # Could add password protection
+    )
+
+
+def _write_private_file(path: Path, data: bytes):
+    """
+    Write secret key material readable only by the owner.
+    The file is created with mode 0600 via O_EXCL, so it is never visible
+    with default permissions, then moved over any existing file.
+    """
+    tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+def _load_private_key_file(path: Path):
+    """
+    Parse a DER private key from a read-only mapping of its file.
+    The parser reads the page cache directly instead of a bytes copy.
+    """
+    from cryptography.hazmat.primitives import serialization
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return serialization.load_der_private_key(mm, password=None)
+
+
+@functools.lru_cache(maxsize=256)
+def _load_peer_public_key(public_key_pem: bytes):
+    """Parse a peer's PEM public key, caching the result per PEM."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.backends import default_backend
+
+    return serialization.load_pem_public_key(
+        public_key_pem,
+        backend=default_backend()
+    )
 
 
 class KeyManager:
@@ -23,79 +94,149 @@ class KeyManager:
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
 
-        self.private_key_path = self.storage_path / 'device_private.key'
+        self.private_key_path = self.storage_path / 'device_private.der'
+        self.legacy_private_key_path = self.storage_path / 'device_private.key'
         self.public_key_path = self.storage_path / 'device_public.pem'
+        # Written by earlier versions; nothing uses them any more
+        self.exchange_key_path = self.storage_path / 'device_exchange.key'
+        self.spare_keys_path = self.storage_path / 'spare_keys'
 
-        self.private_key = None
-        self.public_key = None
+        self._private_key = None
+        self._public_key = None
+        self._public_pem = None
+        self._keygen_future = None
 
         self._load_or_generate_keys()
+        self._remove_unused_keys()
+
+    @property
+    def private_key(self):
+        """Device private key (waits for background generation if needed)."""
+        self._wait_for_keys()
+        return self._private_key
+
+    @property
+    def public_key(self):
+        """Device public key (waits for background generation if needed)."""
+        self._wait_for_keys()
+        return self._public_key
+
+    def _wait_for_keys(self):
+        """Block until background key generation has finished."""
+        if self._keygen_future is not None:
+            self._keygen_future.result()
+
+    def keys_ready(self) -> bool:
+        """Check whether the device keys are available without blocking."""
+        return self._keygen_future is None or self._keygen_future.done()
+
+    def add_ready_callback(self, callback):
+        """
+        Call callback() once the device keys are available.
+        May run on the key generation thread; called immediately if ready.
+        """
+        if self._keygen_future is None:
+            callback()
+        else:
+            self._keygen_future.add_done_callback(lambda _: callback())
 
     def _load_or_generate_keys(self):
         """Load existing keys or generate new ones."""
+        if self.legacy_private_key_path.exists() and not self.private_key_path.exists():
+            self._migrate_legacy_private_key()
+
         if self.private_key_path.exists() and self.public_key_path.exists():
             self._load_keys()
         else:
             self._generate_keys()
 
     def _generate_keys(self):
-        """Generate new RSA key pair (4096-bit for strong security)."""
-        self.private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=4096,
-            backend=default_backend()
-        )
-        self.public_key = self.private_key.public_key()
+        """Start generating a new key pair in the background."""
+        self._keygen_future = _EXECUTOR.submit(self._do_generate_keys)
+
+    def _do_generate_keys(self):
+        """Generate and save a new RSA key pair."""
+        self._save_keys(_generate_rsa_key())
+
+    def _save_keys(self, private_key):
+        """Save an RSA key pair to storage and make it the device key."""
+        from cryptography.hazmat.primitives import serialization
+
+        public_key = private_key.public_key()
 
         # Save private key (encrypted at rest)
-        private_pem = self.private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()  # Could add password protection
-        )
+        private_der = _serialize_private_key(private_key)
 
         # Save public key
-        public_pem = self.public_key.public_bytes(
+        public_pem = public_key.public_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
 
         # Secure file permissions
-        self.private_key_path.write_bytes(private_pem)
-        self.private_key_path.chmod(0o600)
+        _write_private_file(self.private_key_path, private_der)
 
         self.public_key_path.write_bytes(public_pem)
 
+        self._private_key = private_key
+        self._public_key = public_key
+        self._public_pem = public_pem
+
     def _load_keys(self):
         """Load existing keys from storage."""
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.backends import default_backend
+
         # Load private key
-        private_pem = self.private_key_path.read_bytes()
-        self.private_key = serialization.load_pem_private_key(
-            private_pem,
-            password=None,
-            backend=default_backend()
-        )
+        self._private_key = _load_private_key_file(self.private_key_path)
 
         # Load public key
         public_pem = self.public_key_path.read_bytes()
-        self.public_key = serialization.load_pem_public_key(
+        self._public_key = serialization.load_pem_public_key(
             public_pem,
             backend=default_backend()
         )
+        self._public_pem = public_pem
+
+    def _migrate_legacy_private_key(self):
+        """Convert a PEM private key from older versions to DER."""
+        from cryptography.hazmat.primitives import serialization
+
+        private_key = serialization.load_pem_private_key(
+            self.legacy_private_key_path.read_bytes(),
+            password=None
+        )
+        _write_private_file(self.private_key_path, _serialize_private_key(private_key))
+        self.legacy_private_key_path.unlink()
+
+    def _remove_unused_keys(self):
+        """Delete private keys left by earlier versions that nothing uses."""
+        try:
+            self.exchange_key_path.unlink()
+        except OSError:
+            pass
+
+        if not self.spare_keys_path.exists():
+            return
+        for path in self.spare_keys_path.glob('spare_*'):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        try:
+            self.spare_keys_path.rmdir()
+        except OSError:
+            pass
 
     def get_public_key_bytes(self) -> bytes:
         """Get public key as bytes for sharing with peers."""
-        return self.public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
+        # Serialized once when the keys are generated or loaded
+        self._wait_for_keys()
+        return self._public_pem
 
     def load_peer_public_key(self, public_key_pem: bytes):
         """Load a peer's public key from PEM bytes."""
-        return serialization.load_pem_public_key(
-            public_key_pem,
-            backend=default_backend()
-        )
+        return _load_peer_public_key(bytes(public_key_pem))
 
     def generate_session_key(self) -> bytes:
         """Generate ephemeral session key (256-bit)."""
@@ -103,20 +244,29 @@ class KeyManager:
 
     def derive_key(self, shared_secret: bytes, salt: bytes = None) -> bytes:
         """Derive encryption key from shared secret using HKDF."""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+        from cryptography.hazmat.backends import default_backend
+
         if salt is None:
             salt = os.urandom(16)
 
+        # Not cached: a cache would keep shared secrets (or keys derived from
+        # them) in memory after their sessions have ended
         hkdf = HKDF(
             algorithm=hashes.SHA256(),
             length=32,
-            salt=salt,
+            salt=bytes(salt),
             info=b'ghostline-signal-session',
             backend=default_backend()
         )
-        return hkdf.derive(shared_secret)
+        return hkdf.derive(bytes(shared_secret))
 
     def encrypt_session_key(self, session_key: bytes, peer_public_key) -> bytes:
         """Encrypt session key with peer's public key."""
+        from cryptography.hazmat.primitives.asymmetric import padding
+        from cryptography.hazmat.primitives import hashes
+
         encrypted = peer_public_key.encrypt(
             session_key,
             padding.OAEP(
@@ -129,6 +279,9 @@ class KeyManager:
 
     def decrypt_session_key(self, encrypted_key: bytes) -> bytes:
         """Decrypt session key with own private key."""
+        from cryptography.hazmat.primitives.asymmetric import padding
+        from cryptography.hazmat.primitives import hashes
+
         decrypted = self.private_key.decrypt(
             encrypted_key,
             padding.OAEP(
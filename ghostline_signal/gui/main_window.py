@@ -3,25 +3,212 @@ Main window for Ghostline Signal GUI.
 """
 
 import json
-from datetime import datetime, timedelta
+import time
+import base64
+import struct
+import uuid
+import itertools
+import functools
+from collections import OrderedDict, defaultdict
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QTextEdit, QPushButton, QListWidget, QListWidgetItem,
                                QSplitter, QLabel, QLineEdit, QDialog, QFormLayout,
                                QMessageBox, QGroupBox, QDialogButtonBox, QTextBrowser)
-from PySide6.QtCore import Qt, QTimer, Signal, Slot
+from PySide6.QtCore import (Qt, QTimer, Signal, Slot, QCoreApplication, QEvent,
+                            QMutex, QMutexLocker, QRunnable, QThreadPool)
 from PySide6.QtGui import QFont, QAction
 
 from ..crypto import KeyManager, MessageEncryption
 from ..network import P2PNode, ConnectionBroker
 from ..storage import MessageStore
 from ..identity import DeviceIdentity
-from .widgets import MessageBubble, PeerListItem, ConnectionStatus
+from .widgets import PeerListItem, ConnectionStatus, _BubblePool, _fmt_lastseen
+
+# Binary message envelope: type, version, session UUID, sender device UUID
+# and ciphertext length, followed by the raw ciphertext
+_ENVELOPE_HEADER = struct.Struct('<BI16s16sI')
+_ENVELOPE_VERSION = 1
+_MSG_TYPE_MESSAGE = 0x01
+_MSG_TYPE_JSON = 0xFF  # Reserved: a JSON envelope follows the type byte
+
+
+_ABOUT_HTML = """
+<h2>Ghostline Signal</h2>
+<p>Peer-to-peer communication system designed for privacy and locality.</p>
+
+<h3>Design Principles:</h3>
+<ul>
+<li>No accounts, no cloud, no servers</li>
+<li>End-to-end encryption with ephemeral keys</li>
+<li>Traffic obfuscation for privacy</li>
+<li>Device-bound identity</li>
+<li>Local-first architecture</li>
+</ul>
+
+<p><b>Warning:</b> Ghostline Signal prioritises privacy and locality over convenience.
+Misuse, misconfiguration, or loss of devices can result in permanent data loss.</p>
+"""
+
+_CONNECT_INFO_TEXT = (
+    "Enter the Device ID of the peer you want to connect to.\n\n"
+    "Both devices must be running Ghostline Signal with access\n"
+    "to the rendezvous server for automatic discovery.\n\n"
+    "Get your peer's Device ID from: Tools > Device Identity"
+)
+
+_CONNECT_FAILED_TEXT = (
+    "Found device {device_id}... but could not establish direct connection.\n\n"
+    "The peer has been added to your list as 'discovered'.\n\n"
+    "Possible reasons for connection failure:\n"
+    "- Both devices are behind strict NAT\n"
+    "- Firewall blocking connections\n\n"
+    "Try having the other device connect to you instead,\n"
+    "or ensure one device has an open port."
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _font(family: str, size: int, bold: bool = False) -> QFont:
+    """Shared font instance, created on first use once a QApplication exists."""
+    return QFont(family, size, QFont.Bold if bold else -1)
+
+
+class _DecodeTask(QRunnable):
+    """Decrypt one received message off the GUI thread."""
+
+    def __init__(self, window, seq: int, peer_id: str, message: bytes):
+        super().__init__()
+        self.window = window
+        self.seq = seq
+        self.peer_id = peer_id
+        self.message = message
+
+    def run(self):
+        try:
+            decoded = self.window._decode_message(self.peer_id, self.message)
+        except Exception as e:
+            print(f"Error processing received message: {e}")
+            decoded = None
+
+        # Always report back so later messages are not held up
+        self.window.decoded_message_ready.emit(self.seq, decoded)
+
+
+class _LoadPeersTask(QRunnable):
+    """Fetch and format the peer list off the GUI thread."""
+
+    def __init__(self, window, generation: int):
+        super().__init__()
+        self.window = window
+        self.generation = generation
+
+    def run(self):
+        try:
+            rows = self.window._fetch_peer_rows()
+        except Exception as e:
+            print(f"Error loading peers: {e}")
+            return
+
+        self.window.peers_loaded.emit(self.generation, rows)
+
+
+class _StoreMaintenanceTask(QRunnable):
+    """Run the message store's disk housekeeping off the GUI thread."""
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def run(self):
+        try:
+            self.store.run_maintenance()
+        except Exception as e:
+            print(f"Error during message store maintenance: {e}")
+
+
+class _BrokerInitTask(QRunnable):
+    """Initialize the connection broker (STUN, rendezvous) off the GUI thread."""
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+
+    def run(self):
+        broker = self.window.connection_broker
+        broker.set_status_callback(self.window.on_broker_status)
+        broker.set_connection_callback(self.window.on_incoming_connection)
+        broker.set_discovery_callback(self.window.on_peer_discovered)
+        try:
+            broker.initialize()
+        except Exception as e:
+            print(f"Connection broker initialization failed: {e}")
+
+
+class _ConnectTask(QRunnable):
+    """Connect to a peer by device ID and report the outcome through window signals."""
+
+    def __init__(self, window, device_id: str, progress):
+        super().__init__()
+        self.window = window
+        self.device_id = device_id
+        self.progress = progress
+
+    def run(self):
+        window = self.window
+        try:
+            peer_id = window.connection_broker.connect_by_device_id(self.device_id)
+
+            if peer_id:
+                # Add to peers if not exists
+                if not window.message_store.get_peer(peer_id):
+                    window.message_store.add_peer(
+                        peer_id,
+                        b'',
+                        display_name=self.device_id[:8]
+                    )
+                window.device_id_connected.emit(peer_id, self.progress)
+            else:
+                # Connection failed but we may have discovered the peer
+                window.device_id_failed.emit(self.device_id, self.progress)
+
+        except Exception as e:
+            window.device_id_error.emit(str(e), self.progress)
 
 
 class MainWindow(QMainWindow):
     """Main application window."""
 
-    message_received = Signal(str, bytes)
+    raw_message_received = Signal(str, bytes)
+    peer_connection_changed = Signal(str, str)
+    decoded_message_ready = Signal(int, object)
+    peers_loaded = Signal(int, object)
+    keys_ready = Signal()
+    device_id_connected = Signal(str, object)
+    device_id_failed = Signal(str, object)
+    device_id_error = Signal(str, object)
+
+    # Chat view windowing: only a slice of the loaded history is backed by
+    # MessageBubble widgets, shifted a page at a time as the user scrolls
+    MESSAGE_HISTORY_LIMIT = 5000
+    MESSAGE_PAGE_SIZE = 50
+    MAX_RENDERED_MESSAGES = 150
+    SCROLL_EDGE_PX = 100
+
+    # Decrypted message texts kept across peer switches
+    PLAINTEXT_CACHE_SIZE = 5000
+
+    # Sent/received messages are written to the store in batches, after
+    # STORE_FLUSH_INTERVAL_MS or once STORE_FLUSH_MAX rows are waiting
+    STORE_FLUSH_INTERVAL_MS = 200
+    STORE_FLUSH_MAX = 500
+
+    # Messages sent in quick succession go out to a peer in one write;
+    # MAX_SEND_BATCH = 1 sends every message on its own
+    MAX_SEND_BATCH = 16
+    OUTBOX_FLUSH_INTERVAL_MS = 5
+
+    # Bytes each peer connection reads per recv call
+    RECV_CHUNK_SIZE = 8192
 
     def __init__(self):
         super().__init__()
@@ -33,19 +220,77 @@ class MainWindow(QMainWindow):
         self.p2p_node = P2PNode()
         self.encryption = MessageEncryption()
 
+        # Identity is fixed for the process lifetime; render it once for the
+        # identity dialog (the public key is filled in by on_keys_ready)
+        self._device_id_str = self.identity.get_device_id()
+        self._device_name_str = self.identity.get_device_name()
+        self._fingerprint_str = self.identity.get_formatted_fingerprint()
+        self._public_key_str = None
+
         # Connection broker for automatic NAT traversal
         self.connection_broker = None
 
         # Current state
         self.current_peer_id = None
-        self.sessions = {}  # peer_id -> session_key
+        self.sessions = {}  # peer_id -> (session_id, session_key)
+        self._sessions_lock = QMutex()  # Decrypt workers read self.sessions
+
+        # Received messages are decrypted on a worker pool and displayed in order;
+        # the pool also loads the peer list
+        self._worker_pool = QThreadPool(self)
+
+        # Blocking network setup (broker init, connection attempts) runs on its
+        # own pool so it cannot hold up decrypts; it is not waited for on close
+        self._network_pool = QThreadPool(self)
+        self._peers_generation = 0
+        self._decode_seq = itertools.count()
+        self._next_decoded_seq = 0
+        self._decoded_pending = {}
+
+        # Messages of the current chat; rows [_window_start, _window_end) have bubbles
+        self._messages = []
+        self._window_start = 0
+        self._window_end = 0
+        self._window_shifting = False
+        self._scroll_anchor = None
+        self._scroll_pending = False
+        self._pinned_to_bottom = True
+
+        # (session_id, message_id) -> plaintext, least recently used first
+        self._plaintext_cache = OrderedDict()
+
+        # (peer_id, message row) pairs waiting to be written in one transaction
+        self._pending_store = []
+        self._store_flush_timer = QTimer(self)
+        self._store_flush_timer.setSingleShot(True)
+        self._store_flush_timer.setInterval(self.STORE_FLUSH_INTERVAL_MS)
+        self._store_flush_timer.timeout.connect(self._flush_store)
+
+        # peer_id -> envelopes waiting to be sent together
+        self._outbox = defaultdict(list)
+        self._outbox_flush_timer = QTimer(self)
+        self._outbox_flush_timer.setSingleShot(True)
+        self._outbox_flush_timer.setInterval(self.OUTBOX_FLUSH_INTERVAL_MS)
+        self._outbox_flush_timer.timeout.connect(self._flush_outbox)
 
         # Setup UI
         self.setup_ui()
         self.setup_networking()
 
         # Connect signals
-        self.message_received.connect(self.on_message_received_signal)
+        self.raw_message_received.connect(self.on_raw_message_received)
+        self.peer_connection_changed.connect(self.on_peer_connection_changed)
+        self.decoded_message_ready.connect(self.on_decoded_message)
+        self.peers_loaded.connect(self.on_peers_loaded)
+        self.keys_ready.connect(self.on_keys_ready)
+        self.device_id_connected.connect(self.on_device_id_connected)
+        self.device_id_failed.connect(self.on_device_id_failed)
+        self.device_id_error.connect(self.on_device_id_error)
+
+        # Device keys may still be generating in the background on first run
+        if not self.key_manager.keys_ready():
+            self.statusBar().showMessage("Generating device identity keys...")
+        self.key_manager.add_ready_callback(self.keys_ready.emit)
 
         # Start P2P node
         self.start_node()
@@ -54,7 +299,7 @@ class MainWindow(QMainWindow):
         self.init_connection_broker()
 
         # Cleanup timer for expired sessions
-        self.cleanup_timer = QTimer()
+        self.cleanup_timer = QTimer(self)
         self.cleanup_timer.timeout.connect(self.cleanup_sessions)
         self.cleanup_timer.start(60000)  # Every minute
 
@@ -82,7 +327,7 @@ class MainWindow(QMainWindow):
 
         # Peers list
         peers_label = QLabel("Peers")
-        peers_label.setFont(QFont("Arial", 12, QFont.Bold))
+        peers_label.setFont(_font("Arial", 12, bold=True))
         sidebar_layout.addWidget(peers_label)
 
         self.peers_list = QListWidget()
@@ -108,21 +353,18 @@ class MainWindow(QMainWindow):
 
         # Chat header
         self.chat_header = QLabel("Select a peer to start messaging")
-        self.chat_header.setFont(QFont("Arial", 14, QFont.Bold))
+        self.chat_header.setFont(_font("Arial", 14, bold=True))
         self.chat_header.setStyleSheet("padding: 10px; background-color: #f0f0f0;")
         chat_layout.addWidget(self.chat_header)
 
         # Messages area
-        self.messages_widget = QWidget()
-        self.messages_layout = QVBoxLayout()
-        self.messages_layout.addStretch()
-        self.messages_widget.setLayout(self.messages_layout)
-
         from PySide6.QtWidgets import QScrollArea
         scroll_area = QScrollArea()
-        scroll_area.setWidget(self.messages_widget)
         scroll_area.setWidgetResizable(True)
         self.scroll_area = scroll_area
+        self._rebuild_messages_container()
+        scroll_area.verticalScrollBar().valueChanged.connect(self.on_messages_scrolled)
+        scroll_area.verticalScrollBar().rangeChanged.connect(self.on_messages_range_changed)
         chat_layout.addWidget(scroll_area)
 
         # Message input
@@ -176,6 +418,7 @@ class MainWindow(QMainWindow):
         """Setup P2P networking callbacks."""
         self.p2p_node.set_message_callback(self.on_message_received)
         self.p2p_node.set_connection_callback(self.on_connection_event)
+        self.p2p_node.set_recv_chunk_size(self.RECV_CHUNK_SIZE)
 
     def start_node(self):
         """Start the P2P node."""
@@ -212,15 +455,7 @@ class MainWindow(QMainWindow):
             )
 
             # Initialize in background
-            def init_broker():
-                self.connection_broker.set_status_callback(self.on_broker_status)
-                self.connection_broker.set_connection_callback(self.on_incoming_connection)
-                self.connection_broker.set_discovery_callback(self.on_peer_discovered)
-                self.connection_broker.initialize()
-
-            import threading
-            thread = threading.Thread(target=init_broker, daemon=True)
-            thread.start()
+            self._network_pool.start(_BrokerInitTask(self))
 
         except Exception as e:
             print(f"Connection broker initialization failed: {e}")
@@ -257,7 +492,7 @@ class MainWindow(QMainWindow):
             self.load_peers()
 
             # Update connection status
-            peer_count = len(self.p2p_node.get_peer_list())
+            peer_count = self.p2p_node.peer_count
             if peer_count > 0:
                 self.connection_status.set_connected(peer_count)
 
@@ -284,27 +519,51 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(0, add_discovered_peer)
 
     def load_peers(self):
-        """Load peers from storage."""
-        self.peers_list.clear()
-        peers = self.message_store.get_all_peers()
-
-        for peer in peers:
-            item = QListWidgetItem()
-            widget = PeerListItem(
+        """Load peers from storage (fetched on a worker thread)."""
+        self._peers_generation += 1
+        self._worker_pool.start(_LoadPeersTask(self, self._peers_generation))
+
+    def _fetch_peer_rows(self) -> list:
+        """Get (peer_id, display_name, last_seen_text) rows (runs on a worker thread)."""
+        rows = []
+        for peer in self.message_store.get_all_peers():
+            last_seen = peer.get('last_seen')
+            rows.append((
                 peer['peer_id'],
                 peer.get('display_name'),
-                peer.get('last_seen')
-            )
-            item.setSizeHint(widget.sizeHint())
-            item.setData(Qt.UserRole, peer['peer_id'])
-            self.peers_list.addItem(item)
-            self.peers_list.setItemWidget(item, widget)
+                _fmt_lastseen(int(last_seen // 60)) if last_seen else None
+            ))
+        return rows
+
+    @Slot(int, object)
+    def on_peers_loaded(self, generation: int, rows: list):
+        """Rebuild the peer list from prefetched rows."""
+        if generation != self._peers_generation:
+            return  # A newer refresh is on its way
+
+        # Build all rows without intermediate repaints or item signals
+        self.peers_list.setUpdatesEnabled(False)
+        self.peers_list.blockSignals(True)
+        try:
+            self.peers_list.clear()
+            for peer_id, display_name, last_seen_text in rows:
+                item = QListWidgetItem()
+                widget = PeerListItem(peer_id, display_name, last_seen_text=last_seen_text)
+                item.setSizeHint(widget.sizeHint())
+                item.setData(Qt.UserRole, peer_id)
+                self.peers_list.addItem(item)
+                self.peers_list.setItemWidget(item, widget)
+        finally:
+            self.peers_list.blockSignals(False)
+            self.peers_list.setUpdatesEnabled(True)
+            self.peers_list.viewport().update()
 
         # Update connection status
-        peer_count = len(self.p2p_node.get_peer_list())
+        peer_count = self.p2p_node.peer_count
         if peer_count > 0:
             self.connection_status.set_connected(peer_count)
 
+    @Slot(QListWidgetItem)
     def on_peer_selected(self, item: QListWidgetItem):
         """Handle peer selection."""
         peer_id = item.data(Qt.UserRole)
@@ -319,47 +578,217 @@ class MainWindow(QMainWindow):
 
     def load_messages(self, peer_id: str):
         """Load messages for a peer."""
-        # Clear existing messages
-        while self.messages_layout.count() > 1:  # Keep the stretch
-            item = self.messages_layout.takeAt(0)
+        # Load from database; bubbles are only created for the newest page
+        self._flush_store()
+        self._messages = self.message_store.get_messages(peer_id, limit=self.MESSAGE_HISTORY_LIMIT)
+        self._show_latest_messages()
+
+        # Scroll to bottom, holding the window still until the view gets there
+        self._window_shifting = True
+        QTimer.singleShot(0, self._scroll_to_latest)
+
+    def _message_text(self, msg: dict) -> str:
+        """Get the display text of a message row, decrypting it if needed."""
+        if 'text' in msg:
+            return msg['text']
+
+        session_id = msg.get('session_id')
+        cache_key = (session_id, msg.get('id'))
+        message_text = self._plaintext_cache.get(cache_key)
+        if message_text is not None:
+            self._plaintext_cache.move_to_end(cache_key)
+            return message_text
+
+        try:
+            # Decrypt message if we have a session key
+            content = msg['content']
+
+            # Rows belong to the open chat; its session key decrypts its session's rows
+            session = self.sessions.get(self.current_peer_id)
+            if session_id and session and session[0] == session_id:
+                session_key = session[1]
+                decrypted = self.encryption.decrypt_message(content, session_key)
+                decrypted = self.encryption.remove_padding(decrypted)
+                message_text = decrypted.decode('utf-8')
+                self._cache_plaintext(session_id, msg.get('id'), message_text)
+                return message_text
+            return "[Encrypted - Session key not available]"
+
+        except Exception as e:
+            print(f"Error loading message: {e}")
+            return "[Message could not be decrypted]"
+
+    def _cache_plaintext(self, session_id: str, message_id: int, message_text: str):
+        """Remember a decrypted message text, evicting the oldest entry if full."""
+        cache_key = (session_id, message_id)
+        self._plaintext_cache[cache_key] = message_text
+        self._plaintext_cache.move_to_end(cache_key)
+        if len(self._plaintext_cache) > self.PLAINTEXT_CACHE_SIZE:
+            self._plaintext_cache.popitem(last=False)
+
+    def _insert_bubbles(self, index: int, messages: list):
+        """Create bubbles for message rows and insert them at a layout index."""
+        for offset, msg in enumerate(messages):
+            bubble = _BubblePool.acquire(
+                self._message_text(msg),
+                msg['timestamp'],
+                msg['direction'] == 'sent'
+            )
+            self.messages_layout.insertWidget(index + offset, bubble)
+
+    def _remove_bubbles(self, index: int, count: int):
+        """Remove count bubbles starting at a layout index."""
+        for _ in range(count):
+            item = self.messages_layout.takeAt(index)
             if item.widget():
-                item.widget().deleteLater()
+                _BubblePool.release(item.widget())
 
-        # Load from database
-        messages = self.message_store.get_messages(peer_id)
+    def _rebuild_messages_container(self):
+        """Replace the messages widget with an empty one."""
+        if self.scroll_area.widget() is not None:
+            # Keep the old bubbles for reuse; the trailing stretch stays behind
+            self._remove_bubbles(0, self.messages_layout.count() - 1)
 
-        for msg in messages:
-            try:
-                # Decrypt message if we have a session key
-                content = msg['content']
-                session_id = msg.get('session_id')
-
-                if session_id and session_id in self.sessions:
-                    session_key = self.sessions[session_id]
-                    decrypted = self.encryption.decrypt_message(content, session_key)
-                    decrypted = self.encryption.remove_padding(decrypted)
-                    message_text = decrypted.decode('utf-8')
-                else:
-                    message_text = "[Encrypted - Session key not available]"
-
-                bubble = MessageBubble(
-                    message_text,
-                    msg['timestamp'],
-                    msg['direction'] == 'sent'
-                )
-                self.messages_layout.insertWidget(self.messages_layout.count() - 1, bubble)
+        self.messages_widget = QWidget()
+        self.messages_layout = QVBoxLayout()
+        self.messages_layout.addStretch()
+        self.messages_widget.setLayout(self.messages_layout)
 
-            except Exception as e:
-                print(f"Error loading message: {e}")
+        # setWidget() deletes the previous container
+        self.scroll_area.setWidget(self.messages_widget)
+        self._scroll_anchor = None
+        self._window_shifting = False
+
+    def _show_latest_messages(self):
+        """Render the newest page of the current chat, dropping other bubbles."""
+        self._rebuild_messages_container()
+
+        self._window_end = len(self._messages)
+        self._window_start = max(0, self._window_end - self.MESSAGE_PAGE_SIZE)
+        self._insert_bubbles(0, self._messages[self._window_start:self._window_end])
+
+    def _add_message(self, msg: dict):
+        """Append a new message row to the current chat and show it."""
+        if self._window_end != len(self._messages):
+            self._messages.append(msg)
+            self._show_latest_messages()
+            return
 
-        # Scroll to bottom
-        QTimer.singleShot(100, self.scroll_to_bottom)
+        self._messages.append(msg)
+        self._insert_bubbles(self.messages_layout.count() - 1, [msg])
+        self._window_end += 1
+
+        excess = self._window_end - self._window_start - self.MAX_RENDERED_MESSAGES
+        if excess > 0:
+            self._remove_bubbles(0, excess)
+            self._window_start += excess
+
+    @Slot(int)
+    def on_messages_scrolled(self, value: int):
+        """Shift the rendered message window when scrolling near either end."""
+        scrollbar = self.scroll_area.verticalScrollBar()
+        self._pinned_to_bottom = value >= scrollbar.maximum()
+        if self._window_shifting:
+            return
+
+        if value <= self.SCROLL_EDGE_PX and self._window_start > 0:
+            self._shift_window_up()
+        elif (value >= scrollbar.maximum() - self.SCROLL_EDGE_PX
+              and self._window_end < len(self._messages)):
+            self._shift_window_down()
+
+    def _shift_window_up(self):
+        """Render the previous page of history, dropping bubbles at the bottom."""
+        anchor = self.messages_layout.itemAt(0).widget()
+
+        new_start = max(0, self._window_start - self.MESSAGE_PAGE_SIZE)
+        self._insert_bubbles(0, self._messages[new_start:self._window_start])
+        self._window_start = new_start
+
+        excess = self._window_end - self._window_start - self.MAX_RENDERED_MESSAGES
+        if excess > 0:
+            self._remove_bubbles(self.messages_layout.count() - 1 - excess, excess)
+            self._window_end -= excess
+
+        self._keep_scroll_anchor(anchor)
+
+    def _shift_window_down(self):
+        """Render the next page of history, dropping bubbles at the top."""
+        anchor = self.messages_layout.itemAt(self.messages_layout.count() - 2).widget()
+
+        new_end = min(len(self._messages), self._window_end + self.MESSAGE_PAGE_SIZE)
+        self._insert_bubbles(self.messages_layout.count() - 1,
+                             self._messages[self._window_end:new_end])
+        self._window_end = new_end
+
+        excess = self._window_end - self._window_start - self.MAX_RENDERED_MESSAGES
+        if excess > 0:
+            self._remove_bubbles(0, excess)
+            self._window_start += excess
+
+        self._keep_scroll_anchor(anchor)
+
+    @Slot(int, int)
+    def on_messages_range_changed(self, minimum: int, maximum: int):
+        """Keep following the newest message while the view is pinned to the bottom."""
+        if self._pinned_to_bottom and not self._window_shifting:
+            self._schedule_scroll()
+
+    def _settle_layout(self):
+        """Apply pending relayouts now so bubble positions and the scroll range are current."""
+        self.messages_layout.activate()
+        QCoreApplication.sendPostedEvents(None, QEvent.LayoutRequest)
+
+    def _keep_scroll_anchor(self, anchor: QWidget):
+        """Keep anchor at the same on-screen position once the layout settles."""
+        scrollbar = self.scroll_area.verticalScrollBar()
+        value = scrollbar.value()
+        anchor_y = anchor.y()
+        self._scroll_anchor = anchor
+        self._window_shifting = True
+
+        def restore():
+            if self._scroll_anchor is not anchor:
+                return  # Container was rebuilt, anchor is gone
+            self._scroll_anchor = None
+
+            self._settle_layout()
+            scrollbar.setValue(value + anchor.y() - anchor_y)
+            self._window_shifting = False
+
+        QTimer.singleShot(0, restore)
+
+    @Slot()
+    def on_keys_ready(self):
+        """Handle device keys becoming available."""
+        self._public_key_str = self.key_manager.get_public_key_bytes().decode('utf-8')
+        self.statusBar().clearMessage()
+
+    def _scroll_to_latest(self):
+        """Scroll to the newest message after a chat has been loaded."""
+        self._settle_layout()
+        self.scroll_to_bottom()
+        self._window_shifting = False
+
+    def _schedule_scroll(self):
+        """Scroll to the bottom once the current burst of updates has been laid out."""
+        if self._scroll_pending:
+            return
+        self._scroll_pending = True
+        QTimer.singleShot(0, self._do_scroll)
+
+    def _do_scroll(self):
+        """Run a scheduled scroll to the bottom."""
+        self._scroll_pending = False
+        self._settle_layout()
+        self.scroll_to_bottom()
 
     def scroll_to_bottom(self):
         """Scroll messages to bottom."""
         scrollbar = self.scroll_area.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
 
+    @Slot()
     def send_message(self):
         """Send a message to the current peer."""
         if not self.current_peer_id:
@@ -372,18 +801,19 @@ class MainWindow(QMainWindow):
 
         try:
             # Get or create session key
-            session_id = f"session_{self.current_peer_id}_{int(datetime.now().timestamp())}"
             if self.current_peer_id not in self.sessions:
                 # Generate new session key
+                session_id = str(uuid.uuid4())
                 session_key = self.key_manager.generate_session_key()
-                self.sessions[self.current_peer_id] = session_key
+                with QMutexLocker(self._sessions_lock):
+                    self.sessions[self.current_peer_id] = (session_id, session_key)
 
                 # Store session
-                expires_at = (datetime.now() + timedelta(hours=24)).timestamp()
+                expires_at = time.time() + 24 * 3600
                 self.message_store.store_session(session_id, self.current_peer_id,
                                                 session_key, expires_at)
             else:
-                session_key = self.sessions[self.current_peer_id]
+                session_id, session_key = self.sessions[self.current_peer_id]
 
             # Encrypt message
             plaintext = message_text.encode('utf-8')
@@ -391,30 +821,31 @@ class MainWindow(QMainWindow):
             encrypted = self.encryption.encrypt_message(padded, session_key)
 
             # Create message envelope
-            envelope = {
-                'type': 'message',
-                'session_id': session_id,
-                'from': self.identity.get_device_id(),
-                'data': encrypted.hex()
-            }
-            envelope_bytes = json.dumps(envelope).encode('utf-8')
+            envelope_bytes = _ENVELOPE_HEADER.pack(
+                _MSG_TYPE_MESSAGE,
+                _ENVELOPE_VERSION,
+                uuid.UUID(session_id).bytes,
+                uuid.UUID(self.identity.get_device_id()).bytes,
+                len(encrypted)
+            ) + encrypted
 
             # Send to peer
-            self.p2p_node.send_message(self.current_peer_id, envelope_bytes)
+            self._queue_send(self.current_peer_id, envelope_bytes)
+
+            msg = {
+                'content': encrypted,
+                'timestamp': time.time(),
+                'direction': 'sent',
+                'session_id': session_id,
+                'text': message_text
+            }
 
             # Store locally
-            self.message_store.store_message(
-                self.current_peer_id,
-                encrypted,
-                'sent',
-                session_id,
-                delivered=True
-            )
+            self._queue_store(self.current_peer_id, msg)
 
             # Display in UI
-            bubble = MessageBubble(message_text, datetime.now().timestamp(), True)
-            self.messages_layout.insertWidget(self.messages_layout.count() - 1, bubble)
-            self.scroll_to_bottom()
+            self._add_message(msg)
+            self._schedule_scroll()
 
             # Clear input
             self.message_input.clear()
@@ -425,82 +856,218 @@ class MainWindow(QMainWindow):
     def on_message_received(self, peer_id: str, message: bytes):
         """Handle received message (from P2P callback)."""
         # Emit signal to handle in main thread
-        self.message_received.emit(peer_id, message)
+        self.raw_message_received.emit(peer_id, message)
 
     @Slot(str, bytes)
-    def on_message_received_signal(self, peer_id: str, message: bytes):
-        """Handle received message in main thread."""
+    def on_raw_message_received(self, peer_id: str, message: bytes):
+        """Queue a received message for decryption on a worker thread."""
+        self._worker_pool.start(_DecodeTask(self, next(self._decode_seq), peer_id, message))
+
+    def _decode_message(self, peer_id: str, message: bytes):
+        """
+        Parse and decrypt a received message (runs on a worker thread).
+        Returns (peer_id, message_text, timestamp, session_id, encrypted_data),
+        or None if there is nothing to display.
+        """
+        # Parse envelope
+        session_id, from_device, encrypted_data = self._parse_envelope(message)
+
+        with QMutexLocker(self._sessions_lock):
+            session = self.sessions.get(peer_id)
+        if session is None:
+            return None
+        session_key = session[1]
+
+        # Try to decrypt
         try:
-            # Parse envelope
-            envelope = json.loads(message.decode('utf-8'))
-
-            if envelope.get('type') == 'message':
-                session_id = envelope.get('session_id')
-                encrypted_data = bytes.fromhex(envelope.get('data'))
-                from_device = envelope.get('from')
-
-                # Try to decrypt
-                if peer_id in self.sessions:
-                    session_key = self.sessions[peer_id]
-                    try:
-                        decrypted = self.encryption.decrypt_message(encrypted_data, session_key)
-                        decrypted = self.encryption.remove_padding(decrypted)
-                        message_text = decrypted.decode('utf-8')
-
-                        # Store message
-                        self.message_store.store_message(
-                            peer_id,
-                            encrypted_data,
-                            'received',
-                            session_id,
-                            delivered=True
-                        )
-
-                        # Update last seen
-                        self.message_store.update_peer_last_seen(peer_id)
-
-                        # Display if this is the current chat
-                        if peer_id == self.current_peer_id:
-                            bubble = MessageBubble(message_text, datetime.now().timestamp(), False)
-                            self.messages_layout.insertWidget(self.messages_layout.count() - 1, bubble)
-                            self.scroll_to_bottom()
-
-                    except Exception as e:
-                        print(f"Decryption error: {e}")
+            decrypted = self.encryption.decrypt_message(encrypted_data, session_key)
+            decrypted = self.encryption.remove_padding(decrypted)
+            message_text = decrypted.decode('utf-8')
+        except Exception as e:
+            print(f"Decryption error: {e}")
+            return None
+
+        return peer_id, message_text, time.time(), session_id, encrypted_data
+
+    @Slot(int, object)
+    def on_decoded_message(self, seq: int, decoded):
+        """Handle a decoded message in the main thread, in arrival order."""
+        # Workers may finish out of order; hold results until their turn
+        self._decoded_pending[seq] = decoded
+        while self._next_decoded_seq in self._decoded_pending:
+            decoded = self._decoded_pending.pop(self._next_decoded_seq)
+            self._next_decoded_seq += 1
+            if decoded is not None:
+                self._show_received_message(*decoded)
+
+    def _show_received_message(self, peer_id: str, message_text: str, timestamp: float,
+                               session_id: str, encrypted_data: bytes):
+        """Store a decrypted received message and display it if its chat is open."""
+        try:
+            msg = {
+                'content': encrypted_data,
+                'timestamp': timestamp,
+                'direction': 'received',
+                'session_id': session_id,
+                'text': message_text
+            }
+
+            # Store message (last seen is updated when the batch is flushed)
+            self._queue_store(peer_id, msg)
+
+            # Display if this is the current chat
+            if peer_id == self.current_peer_id:
+                self._add_message(msg)
+                self._schedule_scroll()
 
         except Exception as e:
             print(f"Error processing received message: {e}")
 
+    def _queue_send(self, peer_id: str, envelope: bytes):
+        """Queue an envelope so messages sent in quick succession share one write."""
+        if self.MAX_SEND_BATCH <= 1:
+            self.p2p_node.send_message(peer_id, envelope)
+            return
+
+        outbox = self._outbox[peer_id]
+        outbox.append(envelope)
+        if len(outbox) >= self.MAX_SEND_BATCH:
+            self._send_outbox(peer_id)
+        elif not self._outbox_flush_timer.isActive():
+            self._outbox_flush_timer.start()
+
+    @Slot()
+    def _flush_outbox(self):
+        """Send every peer's queued envelopes."""
+        self._outbox_flush_timer.stop()
+        for peer_id in list(self._outbox):
+            try:
+                self._send_outbox(peer_id)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to send message: {e}")
+
+    def _send_outbox(self, peer_id: str):
+        """Send one peer's queued envelopes in a single write."""
+        envelopes = self._outbox.pop(peer_id, None)
+        if envelopes:
+            self.p2p_node.send_messages(peer_id, envelopes)
+
+    def _queue_store(self, peer_id: str, msg: dict):
+        """Queue a message row for the next batched write to the store."""
+        self._pending_store.append((peer_id, msg))
+        if len(self._pending_store) >= self.STORE_FLUSH_MAX:
+            self._flush_store()
+        elif not self._store_flush_timer.isActive():
+            self._store_flush_timer.start()
+
+    @Slot()
+    def _flush_store(self) -> bool:
+        """
+        Write all queued messages to the store in a single transaction.
+        Returns False if the write failed; the rows then stay queued and the
+        flush is retried on the next timer tick.
+        """
+        self._store_flush_timer.stop()
+        if not self._pending_store:
+            return True
+
+        pending, self._pending_store = self._pending_store, []
+        try:
+            message_ids = self.message_store.store_messages_bulk([
+                (peer_id, msg['content'], msg['timestamp'], msg['direction'],
+                 msg['session_id'], True)
+                for peer_id, msg in pending
+            ])
+        except Exception as e:
+            print(f"Error storing messages: {e}")
+            # Put them back ahead of anything queued since, keeping their order
+            self._pending_store[:0] = pending
+            self._store_flush_timer.start()
+            return False
+
+        received_from = set()
+        for (peer_id, msg), message_id in zip(pending, message_ids):
+            msg['id'] = message_id
+            self._cache_plaintext(msg['session_id'], message_id, msg['text'])
+            if msg['direction'] == 'received':
+                received_from.add(peer_id)
+
+        # Update last seen
+        for peer_id in received_from:
+            self.message_store.update_peer_last_seen(peer_id)
+        return True
+
+    @staticmethod
+    def _parse_envelope(message: bytes):
+        """
+        Parse a received message envelope.
+        Returns (session_id, from_device, encrypted_data); raises ValueError
+        for an envelope this client does not understand.
+        """
+        if not message:
+            raise ValueError("Empty message envelope")
+
+        if message[0] in (_MSG_TYPE_JSON, ord('{')):
+            # JSON envelope; older clients send it bare with hex-encoded data
+            legacy = message[0] != _MSG_TYPE_JSON
+            envelope = json.loads(message[0 if legacy else 1:].decode('utf-8'))
+            if envelope.get('type') != 'message':
+                raise ValueError(f"Unknown envelope type {envelope.get('type')!r}")
+            data = envelope.get('data')
+            encrypted_data = bytes.fromhex(data) if legacy else base64.b64decode(data)
+            return (envelope.get('session_id'), envelope.get('from'), encrypted_data)
+
+        if len(message) < _ENVELOPE_HEADER.size:
+            raise ValueError("Truncated message envelope")
+
+        msg_type, version, session_uuid, from_uuid, length = _ENVELOPE_HEADER.unpack_from(message)
+        if msg_type != _MSG_TYPE_MESSAGE:
+            raise ValueError(f"Unknown envelope type 0x{msg_type:02x}")
+        if version != _ENVELOPE_VERSION:
+            raise ValueError(f"Unsupported envelope version {version}")
+
+        encrypted_data = message[_ENVELOPE_HEADER.size:_ENVELOPE_HEADER.size + length]
+        if len(encrypted_data) != length:
+            raise ValueError("Truncated message envelope")
+
+        return (str(uuid.UUID(bytes=session_uuid)), str(uuid.UUID(bytes=from_uuid)),
+                encrypted_data)
+
     def on_connection_event(self, peer_id: str, event: str):
-        """Handle connection events."""
+        """Handle connection events (from P2P callback)."""
+        # Emit signal to handle in main thread
+        self.peer_connection_changed.emit(peer_id, event)
+
+    @Slot(str, str)
+    def on_peer_connection_changed(self, peer_id: str, event: str):
+        """Handle connection events in main thread."""
+        # The node updates its peer table before reporting the event
+        peer_count = self.p2p_node.peer_count
+
         if event == 'connected':
             print(f"Peer connected: {peer_id}")
 
             # Add peer to database if not exists (so it appears in UI)
-            def add_connected_peer():
-                if not self.message_store.get_peer(peer_id):
-                    self.message_store.add_peer(
-                        peer_id,
-                        b'',
-                        display_name=peer_id.split(':')[0][:8]  # Use IP prefix as name
-                    )
-                    self.load_peers()
-                    print(f"[P2P] Added connected peer to database: {peer_id}")
-
-                peer_count = len(self.p2p_node.get_peer_list())
-                self.connection_status.set_connected(peer_count)
+            if not self.message_store.get_peer(peer_id):
+                self.message_store.add_peer(
+                    peer_id,
+                    b'',
+                    display_name=peer_id.split(':')[0][:8]  # Use IP prefix as name
+                )
+                self.load_peers()
+                print(f"[P2P] Added connected peer to database: {peer_id}")
 
-            QTimer.singleShot(0, add_connected_peer)
+            self.connection_status.set_connected(peer_count)
 
         elif event == 'disconnected':
             print(f"Peer disconnected: {peer_id}")
-            peer_count = len(self.p2p_node.get_peer_list())
             if peer_count > 0:
                 self.connection_status.set_connected(peer_count)
             else:
                 host, port = self.p2p_node.get_address()
                 self.connection_status.set_listening(port)
 
+    @Slot()
     def show_connect_dialog(self):
         """Show dialog to connect to a peer."""
         dialog = QDialog(self)
@@ -521,12 +1088,7 @@ class MainWindow(QMainWindow):
         # Info section
         info_group = QGroupBox("How it works")
         info_layout = QVBoxLayout()
-        info_label = QLabel(
-            "Enter the Device ID of the peer you want to connect to.\n\n"
-            "Both devices must be running Ghostline Signal with access\n"
-            "to the rendezvous server for automatic discovery.\n\n"
-            "Get your peer's Device ID from: Tools > Device Identity"
-        )
+        info_label = QLabel(_CONNECT_INFO_TEXT)
         info_label.setStyleSheet("color: #666;")
         info_layout.addWidget(info_label)
         info_group.setLayout(info_layout)
@@ -560,33 +1122,9 @@ class MainWindow(QMainWindow):
         progress.setWindowModality(Qt.WindowModal)
         progress.show()
 
-        def attempt_connection():
-            try:
-                peer_id = self.connection_broker.connect_by_device_id(device_id)
-
-                if peer_id:
-                    # Add to peers if not exists
-                    if not self.message_store.get_peer(peer_id):
-                        self.message_store.add_peer(
-                            peer_id,
-                            b'',
-                            display_name=device_id[:8]
-                        )
-
-                    # Update UI in main thread
-                    QTimer.singleShot(0, lambda: self.on_device_id_connected(peer_id, progress))
-                else:
-                    # Connection failed but we may have discovered the peer
-                    # Add as "discovered" so user knows the peer exists
-                    QTimer.singleShot(0, lambda: self.on_device_id_failed(device_id, progress))
-
-            except Exception as e:
-                QTimer.singleShot(0, lambda: self.on_device_id_error(str(e), progress))
-
-        import threading
-        thread = threading.Thread(target=attempt_connection, daemon=True)
-        thread.start()
+        self._network_pool.start(_ConnectTask(self, device_id, progress))
 
+    @Slot(str, object)
     def on_device_id_connected(self, peer_id: str, progress):
         """Handle successful device ID connection."""
         progress.close()
@@ -594,6 +1132,7 @@ class MainWindow(QMainWindow):
                               f"Connected to peer!\n\nPeer ID: {peer_id}")
         self.load_peers()
 
+    @Slot(str, object)
     def on_device_id_failed(self, device_id: str, progress):
         """Handle failed device ID connection."""
         progress.close()
@@ -610,19 +1149,15 @@ class MainWindow(QMainWindow):
             self.load_peers()
 
         QMessageBox.warning(self, "Connection Failed",
-                          f"Found device {device_id[:8]}... but could not establish direct connection.\n\n"
-                          "The peer has been added to your list as 'discovered'.\n\n"
-                          "Possible reasons for connection failure:\n"
-                          "- Both devices are behind strict NAT\n"
-                          "- Firewall blocking connections\n\n"
-                          "Try having the other device connect to you instead,\n"
-                          "or ensure one device has an open port.")
+                            _CONNECT_FAILED_TEXT.format(device_id=device_id[:8]))
 
+    @Slot(str, object)
     def on_device_id_error(self, error: str, progress):
         """Handle device ID connection error."""
         progress.close()
         QMessageBox.critical(self, "Error", f"Connection error: {error}")
 
+    @Slot()
     def show_add_peer_dialog(self):
         """Show dialog to add a peer identity."""
         dialog = QDialog(self)
@@ -662,6 +1197,7 @@ class MainWindow(QMainWindow):
                 except Exception as e:
                     QMessageBox.critical(self, "Error", f"Failed to add peer: {e}")
 
+    @Slot()
     def show_identity_dialog(self):
         """Show device identity dialog."""
         dialog = QDialog(self)
@@ -674,16 +1210,15 @@ class MainWindow(QMainWindow):
         info_group = QGroupBox("Device Information")
         info_layout = QFormLayout()
 
-        device_id_label = QLabel(self.identity.get_device_id())
+        device_id_label = QLabel(self._device_id_str)
         device_id_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
         info_layout.addRow("Device ID:", device_id_label)
 
-        device_name_label = QLabel(self.identity.get_device_name())
+        device_name_label = QLabel(self._device_name_str)
         info_layout.addRow("Device Name:", device_name_label)
 
-        fingerprint = self.identity.format_fingerprint(self.identity.get_device_fingerprint())
-        fingerprint_label = QLabel(fingerprint)
-        fingerprint_label.setFont(QFont("Courier", 12))
+        fingerprint_label = QLabel(self._fingerprint_str)
+        fingerprint_label.setFont(_font("Courier", 12))
         fingerprint_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
         info_layout.addRow("Fingerprint:", fingerprint_label)
 
@@ -699,7 +1234,10 @@ class MainWindow(QMainWindow):
         key_layout = QVBoxLayout()
 
         public_key_text = QTextBrowser()
-        public_key_text.setPlainText(self.key_manager.get_public_key_bytes().decode('utf-8'))
+        if self._public_key_str is None:
+            # Keys are still generating; this waits for them
+            self._public_key_str = self.key_manager.get_public_key_bytes().decode('utf-8')
+        public_key_text.setPlainText(self._public_key_str)
         public_key_text.setMaximumHeight(200)
         key_layout.addWidget(public_key_text)
 
@@ -714,34 +1252,49 @@ class MainWindow(QMainWindow):
         dialog.setLayout(layout)
         dialog.exec()
 
+    @Slot()
     def show_about_dialog(self):
         """Show about dialog."""
-        about_text = """
-<h2>Ghostline Signal</h2>
-<p>Peer-to-peer communication system designed for privacy and locality.</p>
-
-<h3>Design Principles:</h3>
-<ul>
-<li>No accounts, no cloud, no servers</li>
-<li>End-to-end encryption with ephemeral keys</li>
-<li>Traffic obfuscation for privacy</li>
-<li>Device-bound identity</li>
-<li>Local-first architecture</li>
-</ul>
-
-<p><b>Warning:</b> Ghostline Signal prioritises privacy and locality over convenience.
-Misuse, misconfiguration, or loss of devices can result in permanent data loss.</p>
-        """
-
-        QMessageBox.about(self, "About Ghostline Signal", about_text)
+        QMessageBox.about(self, "About Ghostline Signal", _ABOUT_HTML)
 
+    @Slot()
     def cleanup_sessions(self):
         """Cleanup expired sessions."""
-        self.message_store.cleanup_expired_sessions()
+        expired = set(self.message_store.cleanup_expired_sessions())
+        if expired:
+            # Start a new session on the next send to these peers
+            with QMutexLocker(self._sessions_lock):
+                for peer_id, (session_id, _) in list(self.sessions.items()):
+                    if session_id in expired:
+                        del self.sessions[peer_id]
+
+            for cache_key in [key for key in self._plaintext_cache if key[0] in expired]:
+                del self._plaintext_cache[cache_key]
+
+        if self.message_store.maintenance_due():
+            self._worker_pool.start(_StoreMaintenanceTask(self.message_store))
 
     def closeEvent(self, event):
         """Handle window close."""
         if self.connection_broker:
             self.connection_broker.shutdown()
+
+        # Send what is still queued before the connections close
+        for peer_id in list(self._outbox):
+            try:
+                self._send_outbox(peer_id)
+            except Exception as e:
+                print(f"Error sending queued messages to {peer_id}: {e}")
         self.p2p_node.stop()
+
+        # Finish messages already received, then write everything out
+        QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)  # Queue their decrypts
+        self._worker_pool.waitForDone()
+        QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)  # Display and queue stores
+        if not self._flush_store():
+            self._store_flush_timer.stop()
+            QMessageBox.warning(self, "Messages Not Saved",
+                                f"{len(self._pending_store)} message(s) from this session could "
+                                f"not be saved to local history.")
+        self.message_store.close()
         event.accept()
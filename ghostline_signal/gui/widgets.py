@@ -2,16 +2,58 @@
 Custom widgets for Ghostline Signal GUI.
 """
 
+import functools
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                                QListWidget, QListWidgetItem, QFrame)
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont
 from datetime import datetime
 
+_TIME_FMT = "%H:%M"
+_LASTSEEN_FMT = "%Y-%m-%d %H:%M"
+_MUTED_QSS = "color: #888; font-size: 10px;"
+
+
+@functools.lru_cache(maxsize=8192)
+def _fmt_hm(minute_bucket: int) -> str:
+    """Format a minute (seconds since epoch // 60) as a message time."""
+    return datetime.fromtimestamp(minute_bucket * 60).strftime(_TIME_FMT)
+
+
+@functools.lru_cache(maxsize=1024)
+def _fmt_lastseen(minute_bucket: int) -> str:
+    """Format a minute (seconds since epoch // 60) as a last-seen time."""
+    return datetime.fromtimestamp(minute_bucket * 60).strftime(_LASTSEEN_FMT)
+
+
+@functools.lru_cache(maxsize=1)
+def _bold_font() -> QFont:
+    """Shared bold font, created on first use once a QApplication exists."""
+    font = QFont()
+    font.setBold(True)
+    return font
+
 
 class MessageBubble(QFrame):
     """Custom message bubble widget."""
 
+    _SENT_QSS = """
+        MessageBubble {
+            background-color: #0084ff;
+            color: white;
+            border-radius: 12px;
+            margin-left: 50px;
+        }
+    """
+    _RECV_QSS = """
+        MessageBubble {
+            background-color: #e4e6eb;
+            color: black;
+            border-radius: 12px;
+            margin-right: 50px;
+        }
+    """
+
     def __init__(self, message: str, timestamp: float, is_sent: bool, parent=None):
         super().__init__(parent)
         self.setFrameShape(QFrame.StyledPanel)
@@ -20,47 +62,66 @@ class MessageBubble(QFrame):
         layout.setContentsMargins(10, 5, 10, 5)
 
         # Message text
-        message_label = QLabel(message)
-        message_label.setWordWrap(True)
-        message_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.message_label = QLabel(message)
+        self.message_label.setWordWrap(True)
+        self.message_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
 
         # Timestamp
-        dt = datetime.fromtimestamp(timestamp)
-        time_str = dt.strftime("%H:%M")
-        time_label = QLabel(time_str)
-        time_label.setStyleSheet("color: #888; font-size: 10px;")
+        # Adjacent messages mostly share a minute, so formatting is cached per minute
+        time_str = _fmt_hm(int(timestamp // 60))
+        self.time_label = QLabel(time_str)
+        self.time_label.setStyleSheet(_MUTED_QSS)
 
-        layout.addWidget(message_label)
-        layout.addWidget(time_label, alignment=Qt.AlignRight)
+        layout.addWidget(self.message_label)
+        layout.addWidget(self.time_label, alignment=Qt.AlignRight)
 
         self.setLayout(layout)
 
         # Style based on sent/received
-        if is_sent:
-            self.setStyleSheet("""
-                MessageBubble {
-                    background-color: #0084ff;
-                    color: white;
-                    border-radius: 12px;
-                    margin-left: 50px;
-                }
-            """)
+        self.is_sent = is_sent
+        self.setStyleSheet(self._SENT_QSS if is_sent else self._RECV_QSS)
+
+    def retarget(self, message: str, timestamp: float, is_sent: bool):
+        """Show a different message in this bubble."""
+        self.message_label.setText(message)
+        self.time_label.setText(_fmt_hm(int(timestamp // 60)))
+
+        # Restyling repolishes the whole bubble, so only do it when the side changes
+        if is_sent != self.is_sent:
+            self.is_sent = is_sent
+            self.setStyleSheet(self._SENT_QSS if is_sent else self._RECV_QSS)
+
+
+class _BubblePool:
+    """Free list of MessageBubble widgets, reused instead of rebuilt."""
+
+    MAX_SIZE = 200
+    _free = []
+
+    @classmethod
+    def acquire(cls, message: str, timestamp: float, is_sent: bool) -> MessageBubble:
+        """Get a bubble showing the given message, reusing a released one if possible."""
+        if cls._free:
+            bubble = cls._free.pop()
+            bubble.retarget(message, timestamp, is_sent)
+            return bubble
+        return MessageBubble(message, timestamp, is_sent)
+
+    @classmethod
+    def release(cls, bubble: MessageBubble):
+        """Take a bubble out of its layout's parent and keep it for reuse."""
+        bubble.setParent(None)
+        if len(cls._free) < cls.MAX_SIZE:
+            cls._free.append(bubble)
         else:
-            self.setStyleSheet("""
-                MessageBubble {
-                    background-color: #e4e6eb;
-                    color: black;
-                    border-radius: 12px;
-                    margin-right: 50px;
-                }
-            """)
+            bubble.deleteLater()
 
 
 class PeerListItem(QWidget):
     """Custom peer list item widget."""
 
     def __init__(self, peer_id: str, display_name: str = None, last_seen: float = None,
-                 parent=None):
+                 last_seen_text: str = None, parent=None):
         super().__init__(parent)
 
         layout = QVBoxLayout()
@@ -69,22 +130,20 @@ class PeerListItem(QWidget):
         # Display name or peer ID
         name = display_name if display_name else peer_id
         name_label = QLabel(name)
-        name_font = QFont()
-        name_font.setBold(True)
-        name_label.setFont(name_font)
+        name_label.setFont(_bold_font())
 
         # Peer ID (if different from display name)
         if display_name:
             id_label = QLabel(peer_id)
-            id_label.setStyleSheet("color: #888; font-size: 10px;")
+            id_label.setStyleSheet(_MUTED_QSS)
             layout.addWidget(id_label)
 
-        # Last seen
-        if last_seen:
-            dt = datetime.fromtimestamp(last_seen)
-            last_seen_str = dt.strftime("%Y-%m-%d %H:%M")
-            last_seen_label = QLabel(f"Last seen: {last_seen_str}")
-            last_seen_label.setStyleSheet("color: #888; font-size: 10px;")
+        # Last seen (last_seen_text may be supplied already formatted)
+        if last_seen and not last_seen_text:
+            last_seen_text = _fmt_lastseen(int(last_seen // 60))
+        if last_seen_text:
+            last_seen_label = QLabel(f"Last seen: {last_seen_text}")
+            last_seen_label.setStyleSheet(_MUTED_QSS)
             layout.addWidget(last_seen_label)
 
         layout.addWidget(name_label)
@@ -3,16 +3,34 @@ Device identity management for Ghostline Signal.
 Identity is bound to the device, not a person or account.
 """
 
+import os
 import hashlib
+import secrets
+import socket
+import functools
 import uuid
 from typing import Optional
 from pathlib import Path
 import json
 
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used without it
+    orjson = None
+
+
+@functools.lru_cache(maxsize=1)
+def _hostname() -> str:
+    """This machine's hostname (looked up once per process)."""
+    return socket.gethostname()
+
 
 class DeviceIdentity:
     """Manages the local device identity."""
 
+    # path -> (st_mtime_ns, st_size, data) of the last identity file read or written
+    _identity_cache: dict = {}
+
     def __init__(self, storage_path: str = None):
         """Initialize device identity."""
         if storage_path is None:
@@ -26,6 +44,7 @@ class DeviceIdentity:
         self.device_id: Optional[str] = None
         self.device_name: Optional[str] = None
         self.device_fingerprint: Optional[str] = None
+        self._formatted_fingerprint: Optional[str] = None
 
         self._load_or_create_identity()
 
@@ -39,26 +58,34 @@ class DeviceIdentity:
     def _create_identity(self):
         """Create a new device identity."""
         # Generate unique device ID
-        self.device_id = str(uuid.uuid4())
+        self.device_id = str(uuid.UUID(bytes=secrets.token_bytes(16), version=4))
 
         # Default device name
-        import socket
-        hostname = socket.gethostname()
-        self.device_name = f"Ghostline-{hostname}"
+        self.device_name = f"Ghostline-{_hostname()}"
 
         # Generate device fingerprint
         self.device_fingerprint = self._generate_fingerprint()
+        self._formatted_fingerprint = self.format_fingerprint(self.device_fingerprint)
 
         self._save_identity()
 
     def _load_identity(self):
         """Load existing identity from storage."""
-        with open(self.identity_path, 'r') as f:
-            data = json.load(f)
+        # Skip parsing if the file is unchanged since this process last saw it
+        key = str(self.identity_path)
+        st = self.identity_path.stat()
+        cached = self._identity_cache.get(key)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            data = cached[2]
+        else:
+            raw = self.identity_path.read_bytes()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            self._identity_cache[key] = (st.st_mtime_ns, st.st_size, data)
 
         self.device_id = data.get('device_id')
         self.device_name = data.get('device_name')
         self.device_fingerprint = data.get('device_fingerprint')
+        self._formatted_fingerprint = self.format_fingerprint(self.device_fingerprint or '')
 
     def _save_identity(self):
         """Save identity to storage."""
@@ -68,16 +95,26 @@ class DeviceIdentity:
             'device_fingerprint': self.device_fingerprint
         }
 
-        with open(self.identity_path, 'w') as f:
-            json.dump(data, f, indent=2)
-
-        # Secure file permissions
-        self.identity_path.chmod(0o600)
+        if orjson is not None:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(data, indent=2).encode('utf-8')
+        # Create the file owner-only from the start, so it is never readable by others
+        fd = os.open(self.identity_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+        st = self.identity_path.stat()
+        self._identity_cache[str(self.identity_path)] = (st.st_mtime_ns, st.st_size, data)
 
     def _generate_fingerprint(self) -> str:
         """Generate a device fingerprint based on device ID."""
-        hash_obj = hashlib.sha256(self.device_id.encode())
-        return hash_obj.hexdigest()[:16].upper()
+        # Only the first 8 digest bytes are shown, so hex-encode just those
+        return hashlib.sha256(self.device_id.encode('ascii')).digest()[:8].hex().upper()
 
     def get_device_id(self) -> str:
         """Get the device ID."""
@@ -96,6 +133,10 @@ class DeviceIdentity:
         """Get the device fingerprint for verification."""
         return self.device_fingerprint
 
+    def get_formatted_fingerprint(self) -> str:
+        """Get the device fingerprint formatted for display."""
+        return self._formatted_fingerprint
+
     def get_identity_summary(self) -> dict:
         """Get a summary of the device identity."""
         return {
@@ -104,9 +145,18 @@ class DeviceIdentity:
             'fingerprint': self.device_fingerprint
         }
 
+    @staticmethod
+    def verify_many(fingerprints: list, known: list) -> list:
+        """
+        Check many fingerprints against a set of known ones.
+        Accepts raw or display-formatted fingerprints; returns a bool per input.
+        """
+        known_set = {fp.replace('-', '').upper() for fp in known}
+        return [fp.replace('-', '').upper() in known_set for fp in fingerprints]
+
     @staticmethod
     def format_fingerprint(fingerprint: str) -> str:
         """Format fingerprint for display (e.g., XXXX-XXXX-XXXX-XXXX)."""
         if len(fingerprint) == 16:
-            return '-'.join([fingerprint[i:i+4] for i in range(0, 16, 4)])
+            return f"{fingerprint[0:4]}-{fingerprint[4:8]}-{fingerprint[8:12]}-{fingerprint[12:16]}"
         return fingerprint
@@ -5,7 +5,8 @@ Handles P2P connections and traffic obfuscation.
 
 from .p2p import P2PNode
 from .obfuscation import TrafficObfuscator
-from .nat_traversal import STUNClient, RendezvousClient
-from .connection_broker import ConnectionBroker
+from .nat_traversal import STUNClient, RendezvousClient, BatchingRendezvousClient
+from .connection_broker import ConnectionBroker, enable_console_logging
 
-__all__ = ['P2PNode', 'TrafficObfuscator', 'STUNClient', 'RendezvousClient', 'ConnectionBroker']
+__all__ = ['P2PNode', 'TrafficObfuscator', 'STUNClient', 'RendezvousClient', 'BatchingRendezvousClient',
+           'ConnectionBroker', 'enable_console_logging']
@@ -3,13 +3,62 @@ Connection broker for Ghostline Signal.
 Handles automatic peer discovery and NAT traversal using device IDs.
 """
 
+import os
+import errno
 import socket
+import selectors
 import time
+import ipaddress
+import logging
+import functools
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from typing import Optional, Callable, Dict
-from .nat_traversal import STUNClient, RendezvousClient, HolePuncher
+from .nat_traversal import STUNClient, RendezvousClient, RendezvousSession, HolePuncher
 from .p2p import P2PNode
 
+logger = logging.getLogger(__name__)
+
+try:
+    import ifaddr
+except ImportError:  # Optional; the outbound route is used without it
+    ifaddr = None
+
+
+def enable_console_logging(level: int = logging.INFO):
+    """Print broker status messages to stderr (for command-line use)."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[ConnectionBroker] %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def _is_private(host: str) -> bool:
+    """Check whether host is a private, loopback or link-local IP literal."""
+    try:
+        return ipaddress.ip_address(host).is_private
+    except ValueError:
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def _discover_local_ip() -> str:
+    """Find this machine's LAN IPv4 address (looked up once per process)."""
+    if ifaddr is not None:
+        for adapter in ifaddr.get_adapters():
+            for ip in adapter.ips:
+                if (isinstance(ip.ip, str) and not ip.ip.startswith('127.')
+                        and not ip.ip.startswith('169.254.')):
+                    return ip.ip
+
+    try:
+        # Ask the routing table which address reaches the internet (no packet is sent)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
 
 class ConnectionBroker:
     """
@@ -17,6 +66,9 @@ class ConnectionBroker:
     Handles NAT traversal, peer discovery, and connection establishment.
     """
 
+    CONNECT_TIMEOUT = 5     # Seconds allowed for each direct connection attempt
+    CONNECT_STAGGER = 0.1   # Head start given to each earlier (preferred) address
+
     def __init__(self, p2p_node: P2PNode, device_id: str,
                  use_rendezvous: bool = True,
                  rendezvous_server: str = None):
@@ -41,15 +93,18 @@ class ConnectionBroker:
         self.local_ip: Optional[str] = None
         self.local_port: Optional[int] = None
 
-        # Rendezvous client
+        # Rendezvous client, reusing a small pool of keep-alive connections
         if use_rendezvous:
             if rendezvous_server:
                 host, port = rendezvous_server.split(':')
-                self.rendezvous = RendezvousClient(host, int(port))
+                port = int(port)
             else:
                 # Default to built-in fallback
-                self.rendezvous = RendezvousClient('127.0.0.1', 8080)
+                host, port = '127.0.0.1', 8080
+            self._http = RendezvousSession(host, port)
+            self.rendezvous = RendezvousClient(host, port, session=self._http)
         else:
+            self._http = None
             self.rendezvous = None
 
         self.status_callback: Optional[Callable] = None
@@ -59,7 +114,9 @@ class ConnectionBroker:
         # Polling for incoming connection requests
         self.running = False
         self.poll_thread: Optional[threading.Thread] = None
-        self.poll_interval = 2  # Check every 2 seconds
+        self._stop_event = threading.Event()  # Set by shutdown() to wake the poll loop
+        self.poll_interval = 2  # Fallback interval when long-polling isn't available
+        self.long_poll_timeout = 25  # Server holds each poll until a request arrives
 
     def initialize(self) -> bool:
         """
@@ -74,9 +131,15 @@ class ConnectionBroker:
 
         self._notify_status(f"Local address: {self.local_ip}:{self.local_port}")
 
-        # Discover public IP using STUN
-        self._notify_status("Discovering public IP address...")
-        public_addr = STUNClient.discover_public_address(self.local_port)
+        # Discover public IP using STUN, unless this is a LAN-only setup
+        # (explicitly, or because the rendezvous server is on a private address)
+        if os.environ.get('GHOSTLINE_NO_STUN') or (
+                self.rendezvous and _is_private(self.rendezvous.server_host)):
+            self._notify_status("Skipping public IP discovery (LAN-only)")
+            public_addr = None
+        else:
+            self._notify_status("Discovering public IP address...")
+            public_addr = STUNClient.discover_public_address(self.local_port, device_id=self.device_id)
 
         if public_addr:
             self.public_ip, self.public_port = public_addr
@@ -113,51 +176,79 @@ class ConnectionBroker:
             return
 
         self.running = True
+        self._stop_event.clear()
 
         def poll_loop():
             while self.running:
+                started = time.time()
+                handled = 0
                 try:
-                    self._check_incoming_requests()
+                    handled = self._check_incoming_requests()
                 except Exception as e:
-                    print(f"[ConnectionBroker] Poll error: {e}")
-                time.sleep(self.poll_interval)
+                    logger.warning("Poll error: %s", e)
+
+                # A long-poll only comes back early with requests; an early
+                # empty answer means an older server or an error, so back off
+                if not handled and time.time() - started < self.poll_interval:
+                    if self._stop_event.wait(self.poll_interval):
+                        break
 
         self.poll_thread = threading.Thread(target=poll_loop, daemon=True)
         self.poll_thread.start()
         self._notify_status("Listening for incoming connection requests")
 
-    def _check_incoming_requests(self):
-        """Check for and handle incoming connection requests."""
-        if not self.rendezvous:
-            return
-
-        requests = self.rendezvous.get_connect_requests(self.device_id)
+    def _check_incoming_requests(self) -> int:
+        """
+        Wait for and handle incoming connection requests.
+        Returns the number of requests handled.
+        """
+        rendezvous = self.rendezvous
+        if not rendezvous:
+            return 0
+
+        device_id = self.device_id
+        requests = rendezvous.get_connect_requests(device_id, wait=self.long_poll_timeout)
+        if not requests:
+            return 0
+
+        # Bind what the loop uses once; callbacks are read now so a request
+        # batch is handled consistently
+        notify = self._notify_status
+        connect = self._connect_to_device_info
+        clear = rendezvous.clear_connect_request
+        connection_callback = self.connection_callback
+        discovery_callback = self.discovery_callback
 
         for req in requests:
-            requester_id = req.get('requester_id')
-            requester_info = req.get('requester_info', {})
-
+            try:
+                requester_id = req['requester_id']
+            except KeyError:
+                continue
             if not requester_id:
                 continue
+            requester_info = req.get('requester_info', {})
+            short_id = requester_id[:8]
 
-            self._notify_status(f"Incoming connection request from {requester_id[:8]}...")
+            notify(f"Incoming connection request from {short_id}...")
 
             # Try to connect back to the requester
-            peer_id = self._connect_to_device_info(requester_info)
+            peer_id = connect(requester_info)
 
             # Clear the request regardless of connection success
-            self.rendezvous.clear_connect_request(self.device_id, requester_id)
+            clear(device_id, requester_id)
 
             if peer_id:
-                self._notify_status(f"Connected to {requester_id[:8]}...")
+                notify(f"Connected to {short_id}...")
                 # Notify callback if set
-                if self.connection_callback:
-                    self.connection_callback(peer_id, requester_id)
+                if connection_callback:
+                    connection_callback(peer_id, requester_id)
             else:
                 # Connection failed but we discovered the peer - notify discovery callback
-                self._notify_status(f"Discovered {requester_id[:8]}... but could not connect (NAT)")
-                if self.discovery_callback:
-                    self.discovery_callback(requester_id, requester_info)
+                notify(f"Discovered {short_id}... but could not connect (NAT)")
+                if discovery_callback:
+                    discovery_callback(requester_id, requester_info)
+
+        return len(requests)
 
     def connect_by_device_id(self, peer_device_id: str) -> Optional[str]:
         """
@@ -194,22 +285,36 @@ class ConnectionBroker:
         # Step 3: If direct connection failed, wait briefly for peer to connect to us
         # The peer should have seen our request and may be connecting back
         self._notify_status("Waiting for peer to establish connection...")
-        initial_peers = set(self.p2p_node.get_peer_list())
+        new_peers = []
+        peer_connected = threading.Event()
 
-        for i in range(10):  # Wait up to 10 seconds
-            time.sleep(1)
-            # Check if a new peer connected to us
-            current_peers = set(self.p2p_node.get_peer_list())
-            new_peers = current_peers - initial_peers
+        def on_connection(peer_id: str, event: str):
+            if event == 'connected' and not peer_connected.is_set():
+                new_peers.append(peer_id)
+                peer_connected.set()
 
-            if new_peers:
-                # A new peer appeared - it might be our target
-                new_peer_id = next(iter(new_peers))
-                self._notify_status(f"Peer connected: {new_peer_id}")
-                return new_peer_id
+        # Connections that land before the listener is registered show up as a
+        # version change; only then is the peer list compared
+        initial_version = self.p2p_node.peer_version
+        initial_peers = frozenset(self.p2p_node.get_peer_list())
 
-            if i == 4:
+        self.p2p_node.add_connection_listener(on_connection)
+        try:
+            # Wait up to 10 seconds
+            if not peer_connected.wait(timeout=5):
                 self._notify_status("Still waiting for peer...")
+                peer_connected.wait(timeout=5)
+        finally:
+            self.p2p_node.remove_connection_listener(on_connection)
+
+        if not new_peers and self.p2p_node.peer_version != initial_version:
+            new_peers.extend(frozenset(self.p2p_node.get_peer_list()) - initial_peers)
+
+        if new_peers:
+            # A new peer appeared - it might be our target
+            new_peer_id = new_peers[0]
+            self._notify_status(f"Peer connected: {new_peer_id}")
+            return new_peer_id
 
         self._notify_status("Connection failed - peer may be behind strict NAT")
         return None
@@ -219,17 +324,18 @@ class ConnectionBroker:
         public_addr = device_info.get('public_addr', {})
         local_addr = device_info.get('local_addr', {})
 
-        # Try local address first (if on same network)
+        # Try local (if on same network) and public addresses at once,
+        # giving the local one a head start
+        candidates = []
         if local_addr and local_addr.get('ip'):
-            self._notify_status(f"Trying local address: {local_addr['ip']}:{local_addr['port']}")
-            peer_id = self._try_connect(local_addr['ip'], local_addr['port'])
-            if peer_id:
-                return peer_id
-
-        # Try public address
+            candidates.append(('local', local_addr['ip'], local_addr['port']))
         if public_addr and public_addr.get('ip'):
-            self._notify_status(f"Trying public address: {public_addr['ip']}:{public_addr['port']}")
-            peer_id = self._try_connect(public_addr['ip'], public_addr['port'])
+            public = (public_addr['ip'], public_addr['port'])
+            if not any(candidate[1:] == public for candidate in candidates):
+                candidates.append(('public', *public))
+
+        if candidates:
+            peer_id = self._race_connect(candidates)
             if peer_id:
                 return peer_id
 
@@ -242,20 +348,92 @@ class ConnectionBroker:
 
         return None
 
-    def _try_connect(self, host: str, port: int, timeout: int = 5) -> Optional[str]:
-        """Try to connect to a peer."""
+    def _race_connect(self, candidates: list) -> Optional[str]:
+        """
+        Connect to all candidate (label, host, port) addresses concurrently,
+        starting each one CONNECT_STAGGER after the previous, and add the
+        first socket to connect as a peer. Later successes are closed.
+        """
+        done = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(candidates))
+        futures = {}
+        for i, (label, host, port) in enumerate(candidates):
+            self._notify_status(f"Trying {label} address: {host}:{port}")
+            future = executor.submit(self._open_connection, host, port,
+                                     i * self.CONNECT_STAGGER, done)
+            futures[future] = (host, port)
+        executor.shutdown(wait=False)
+
         try:
-            peer_id = self.p2p_node.connect_to_peer(host, port)
-            return peer_id
-        except Exception as e:
+            deadline = self.CONNECT_TIMEOUT + len(candidates) * self.CONNECT_STAGGER
+            for future in as_completed(futures, timeout=deadline):
+                sock = future.result()
+                if sock is None:
+                    continue
+
+                # Stop attempts that have not started and close the losers
+                done.set()
+                for other in futures:
+                    if other is not future:
+                        other.add_done_callback(self._close_connection_result)
+
+                host, port = futures[future]
+                return self.p2p_node.add_connected_socket(sock, f"{host}:{port}")
+        except FuturesTimeout:
+            pass
+
+        done.set()
+        return None
+
+    def _open_connection(self, host: str, port: int, delay: float,
+                         done: threading.Event) -> Optional[socket.socket]:
+        """
+        Open a TCP connection after delay seconds, giving up after
+        CONNECT_TIMEOUT or as soon as done is set.
+        """
+        if delay and done.wait(delay):
             return None
 
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setblocking(False)
+            err = sock.connect_ex((host, port))
+            if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                sock.close()
+                return None
+
+            # Wait for the handshake in short slices so a lost race stops early
+            deadline = time.monotonic() + self.CONNECT_TIMEOUT
+            with selectors.DefaultSelector() as selector:
+                selector.register(sock, selectors.EVENT_WRITE)
+                while not done.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    if selector.select(min(remaining, 0.1)):
+                        if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                            sock.setblocking(True)
+                            return sock
+                        break
+        except OSError:
+            pass
+
+        sock.close()
+        return None
+
+    @staticmethod
+    def _close_connection_result(future):
+        """Close the socket of a connection attempt that lost the race."""
+        sock = future.result()
+        if sock is not None:
+            sock.close()
+
     def _try_hole_punching(self, remote_ip: str, remote_port: int) -> Optional[str]:
         """Try hole punching to establish connection."""
-        # This is a simplified version
-        # Full implementation would require coordination via rendezvous server
+        # Without a start time agreed through the rendezvous server both sides
+        # dial as soon as they learn about each other
         try:
-            sock = HolePuncher.punch_hole_tcp(self.local_port, remote_ip, remote_port)
+            sock = HolePuncher.simultaneous_connect(self.local_port, remote_ip, remote_port)
             if sock:
                 # Connection established via hole punching
                 # Integrate the socket with P2PNode
@@ -269,19 +447,11 @@ class ConnectionBroker:
 
     def _get_local_ip(self) -> str:
         """Get local IP address."""
-        try:
-            # Create a socket to determine local IP
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-            return local_ip
-        except:
-            return "127.0.0.1"
+        return _discover_local_ip()
 
     def _notify_status(self, message: str):
         """Notify status change."""
-        print(f"[ConnectionBroker] {message}")
+        logger.info("%s", message)
         if self.status_callback:
             self.status_callback(message)
 
@@ -292,10 +462,13 @@ class ConnectionBroker:
     def shutdown(self):
         """Shutdown connection broker."""
         self.running = False
+        self._stop_event.set()
         if self.poll_thread and self.poll_thread.is_alive():
             self.poll_thread.join(timeout=3)
         if self.rendezvous:
             self.rendezvous.unregister_device(self.device_id)
+        if self._http:
+            self._http.close()
 
     def set_connection_callback(self, callback: Callable):
         """Set callback for new incoming connections."""
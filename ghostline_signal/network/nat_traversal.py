@@ -3,14 +3,32 @@ NAT traversal and peer discovery for Ghostline Signal.
 Enables global P2P connections without port forwarding.
 """
 
+import errno
 import socket
 import struct
-import random
+import hashlib
+import secrets
+import selectors
 import time
 import json
+import queue
+import http.client
+import concurrent.futures
 from typing import Optional, Tuple, Dict
 import threading
 
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used without it
+    orjson = None
+
+
+# STUN wire structures, compiled once
+_U16 = struct.Struct('>H')
+_STUN_HDR = struct.Struct('>HHI12s')   # type, length, magic cookie, transaction ID
+_STUN_ATTR = struct.Struct('>HH')      # attribute type, length
+_XOR_MAP = struct.Struct('>BBHI')      # reserved, family, port, IPv4 address
+
 
 class STUNClient:
     """STUN client for discovering public IP and port (RFC 5389)."""
@@ -35,84 +53,188 @@ class STUNClient:
     # Magic cookie (RFC 5389)
     MAGIC_COOKIE = 0x2112A442
 
+    # XOR-MAPPED-ADDRESS port mask (cookie high 16 bits) and IPv4 mask
+    # (cookie) as one 48-bit integer, so both are decoded with a single XOR
+    XOR_MASK6 = (MAGIC_COOKIE >> 16) << 32 | MAGIC_COOKIE
+
+    # Overall deadline for a discovery race, and the offsets (from the first
+    # send) at which unanswered binding requests are retransmitted
+    DISCOVERY_TIMEOUT = 1.5
+    RETRANSMIT_SCHEDULE = (0.25, 0.75)
+
+    # Servers asked first; the rest join the race at the first retransmit
+    RACE_WIDTH = 3
+
+    # How long a discovered mapping is reused before STUN is asked again
+    CACHE_TTL = 60
+
+    # local_port -> (public_ip, public_port, expiry)
+    _addr_cache: Dict[int, Tuple[str, int, float]] = {}
+    _cache_lock = threading.Lock()
+
     @staticmethod
-    def discover_public_address(local_port: int = 0) -> Optional[Tuple[str, int]]:
+    def discover_public_address(local_port: int = 0, use_cache: bool = True,
+                                device_id: str = None) -> Optional[Tuple[str, int]]:
         """
         Discover public IP and port using STUN.
+        A mapping found within the last CACHE_TTL seconds for the same local
+        port is returned without network I/O unless use_cache is False.
+        device_id picks which servers are preferred (see _rank_servers).
         Returns (public_ip, public_port) or None if failed.
         """
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(3)
+        if use_cache:
+            with STUNClient._cache_lock:
+                cached = STUNClient._addr_cache.get(local_port)
+            if cached and time.monotonic() < cached[2]:
+                return cached[0], cached[1]
+
+        ranked = STUNClient._rank_servers(device_id or socket.gethostname())
+        public_addr = STUNClient._probe_servers(local_port, ranked)
+        if public_addr:
+            with STUNClient._cache_lock:
+                STUNClient._addr_cache[local_port] = (
+                    public_addr[0], public_addr[1], time.monotonic() + STUNClient.CACHE_TTL
+                )
+
+        return public_addr
 
-        if local_port:
-            sock.bind(('0.0.0.0', local_port))
+    @staticmethod
+    def invalidate_cache():
+        """Forget all cached mappings, e.g. after the network changes."""
+        with STUNClient._cache_lock:
+            STUNClient._addr_cache.clear()
 
-        # Try multiple STUN servers
-        for stun_server, stun_port in STUNClient.STUN_SERVERS:
-            try:
-                # Create STUN binding request
-                transaction_id = random.randbytes(12)
-                request = STUNClient._create_binding_request(transaction_id)
+    @staticmethod
+    def _rank_servers(key: str) -> list:
+        """
+        Order STUN_SERVERS by rendezvous (highest random weight) hash of key and
+        the current hour, so devices spread over the servers evenly while each
+        one keeps the same preference for an hour.
+        """
+        epoch_hour = int(time.time() // 3600)
 
-                # Send request
-                sock.sendto(request, (stun_server, stun_port))
+        def score(server):
+            return hashlib.blake2s(f"{key}|{server[0]}:{server[1]}|{epoch_hour}".encode(), digest_size=8).digest()
 
-                # Receive response
-                data, _ = sock.recvfrom(2048)
+        return sorted(STUNClient.STUN_SERVERS, key=score, reverse=True)
 
-                # Parse response
-                public_addr = STUNClient._parse_binding_response(data, transaction_id)
-                if public_addr:
-                    sock.close()
-                    return public_addr
+    @staticmethod
+    def _probe_servers(local_port: int, servers: list) -> Optional[Tuple[str, int]]:
+        """
+        Send binding requests to the first RACE_WIDTH servers at once, widen
+        to the rest on the first retransmit, and return the first valid
+        answer, so one unresponsive server no longer stalls discovery.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
-            except Exception as e:
-                print(f"STUN request to {stun_server} failed: {e}")
-                continue
+        try:
+            if local_port:
+                sock.bind(('0.0.0.0', local_port))
+            sock.setblocking(False)
+
+            # One transaction per server: transaction_id -> (request, server address)
+            pending = {}
+            reserve = {}
+            for index, (stun_server, stun_port) in enumerate(servers):
+                transaction_id = secrets.token_bytes(12)
+                request = STUNClient._create_binding_request(transaction_id)
+                target = pending if index < STUNClient.RACE_WIDTH else reserve
+                target[transaction_id] = (request, (stun_server, stun_port))
+
+            STUNClient._send_binding_requests(sock, pending)
+            if not pending:
+                # None of the preferred servers could be reached
+                pending, reserve = reserve, {}
+                STUNClient._send_binding_requests(sock, pending)
+
+            started = time.monotonic()
+            deadline = started + STUNClient.DISCOVERY_TIMEOUT
+            retransmits = [started + offset for offset in STUNClient.RETRANSMIT_SCHEDULE]
+
+            with selectors.DefaultSelector() as selector:
+                selector.register(sock, selectors.EVENT_READ)
+
+                while pending:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        break
+
+                    if retransmits and now >= retransmits[0]:
+                        retransmits.pop(0)
+                        pending.update(reserve)
+                        reserve = {}
+                        STUNClient._send_binding_requests(sock, pending)
+                        continue
+
+                    wake = retransmits[0] if retransmits else deadline
+                    if not selector.select(min(wake, deadline) - now):
+                        continue
+
+                    try:
+                        data, _ = sock.recvfrom(2048)
+                    except OSError:
+                        continue
+
+                    # Match the datagram to its transaction and parse it
+                    transaction_id = data[8:20]
+                    if transaction_id not in pending:
+                        continue
+
+                    public_addr = STUNClient._parse_binding_response(data, transaction_id)
+                    if public_addr:
+                        return public_addr
+
+        except Exception as e:
+            print(f"STUN discovery failed: {e}")
+
+        finally:
+            sock.close()
 
-        sock.close()
         return None
 
+    @staticmethod
+    def _send_binding_requests(sock: socket.socket, pending: Dict[bytes, tuple]):
+        """Send every outstanding binding request, dropping servers that cannot be reached."""
+        for transaction_id, (request, address) in list(pending.items()):
+            try:
+                sock.sendto(request, address)
+            except Exception as e:
+                print(f"STUN request to {address[0]} failed: {e}")
+                del pending[transaction_id]
+
     @staticmethod
     def _create_binding_request(transaction_id: bytes) -> bytes:
         """Create STUN Binding Request message."""
-        # Message type (Binding Request)
-        message_type = struct.pack('>H', STUNClient.BINDING_REQUEST)
-        # Message length (no attributes)
-        message_length = struct.pack('>H', 0)
-        # Magic cookie
-        magic_cookie = struct.pack('>I', STUNClient.MAGIC_COOKIE)
-
-        return message_type + message_length + magic_cookie + transaction_id
+        # Binding Request, no attributes, magic cookie, transaction ID
+        return _STUN_HDR.pack(STUNClient.BINDING_REQUEST, 0, STUNClient.MAGIC_COOKIE, transaction_id)
 
     @staticmethod
     def _parse_binding_response(data: bytes, transaction_id: bytes) -> Optional[Tuple[str, int]]:
         """Parse STUN Binding Response."""
-        if len(data) < 20:
+        if len(data) < _STUN_HDR.size:
             return None
 
-        # Verify message type
-        msg_type = struct.unpack('>H', data[0:2])[0]
-        if msg_type != STUNClient.BINDING_RESPONSE:
-            return None
+        msg_type, msg_length, cookie, response_id = _STUN_HDR.unpack_from(data, 0)
 
-        # Verify transaction ID
-        if data[8:20] != transaction_id:
+        # Verify message type, magic cookie and transaction ID
+        if msg_type != STUNClient.BINDING_RESPONSE or cookie != STUNClient.MAGIC_COOKIE:
+            return None
+        if response_id != transaction_id:
             return None
 
         # Parse attributes
-        offset = 20
-        msg_length = struct.unpack('>H', data[2:4])[0]
+        offset = _STUN_HDR.size
+        end = _STUN_HDR.size + msg_length
+        data_length = len(data)
 
-        while offset < 20 + msg_length:
-            if offset + 4 > len(data):
+        while offset < end:
+            if offset + _STUN_ATTR.size > data_length:
                 break
 
-            attr_type = struct.unpack('>H', data[offset:offset+2])[0]
-            attr_length = struct.unpack('>H', data[offset+2:offset+4])[0]
-            offset += 4
+            attr_type, attr_length = _STUN_ATTR.unpack_from(data, offset)
+            offset += _STUN_ATTR.size
 
-            if offset + attr_length > len(data):
+            if offset + attr_length > data_length:
                 break
 
             # XOR-MAPPED-ADDRESS (preferred)
@@ -123,33 +245,28 @@ class STUNClient:
             elif attr_type == STUNClient.MAPPED_ADDRESS:
                 return STUNClient._parse_mapped_address(data[offset:offset+attr_length])
 
-            offset += attr_length
             # Attributes are padded to 4-byte boundary
-            if attr_length % 4:
-                offset += 4 - (attr_length % 4)
+            offset += (attr_length + 3) & ~3
 
         return None
 
     @staticmethod
     def _parse_xor_mapped_address(data: bytes, transaction_id: bytes) -> Optional[Tuple[str, int]]:
         """Parse XOR-MAPPED-ADDRESS attribute."""
-        if len(data) < 8:
+        if len(data) < _XOR_MAP.size:
             return None
 
         family = data[1]
         if family != 0x01:  # IPv4 only for now
             return None
 
-        # XOR port with most significant 16 bits of magic cookie
-        xor_port = struct.unpack('>H', data[2:4])[0]
-        port = xor_port ^ (STUNClient.MAGIC_COOKIE >> 16)
-
-        # XOR IP with magic cookie
-        xor_ip = struct.unpack('>I', data[4:8])[0]
-        ip = xor_ip ^ STUNClient.MAGIC_COOKIE
+        # XOR port with most significant 16 bits of magic cookie and IP with
+        # the magic cookie, in one go
+        raw = int.from_bytes(data[2:8], 'big') ^ STUNClient.XOR_MASK6
+        port = raw >> 32
 
         # Convert to dotted decimal
-        ip_str = socket.inet_ntoa(struct.pack('>I', ip))
+        ip_str = socket.inet_ntoa((raw & 0xFFFFFFFF).to_bytes(4, 'big'))
 
         return (ip_str, port)
 
@@ -163,26 +280,114 @@ class STUNClient:
         if family != 0x01:  # IPv4
             return None
 
-        port = struct.unpack('>H', data[2:4])[0]
+        port = _U16.unpack_from(data, 2)[0]
         ip = socket.inet_ntoa(data[4:8])
 
         return (ip, port)
 
 
+# What a keep-alive connection the server already closed fails with. These
+# come before any response bytes, so the request can safely be sent again.
+# (RemoteDisconnected is also a ConnectionResetError; listed for clarity.)
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class RendezvousSession:
+    """
+    Pool of keep-alive HTTP connections to one rendezvous server.
+    Safe to share between threads; each request borrows its own connection,
+    so a long-poll does not hold up heartbeats or lookups.
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int = 4):
+        """Initialize the session; connections are opened on first use."""
+        self.host = host
+        self.port = port
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def post(self, path: str, body: bytes, timeout: float = 5) -> Tuple[int, bytes]:
+        """POST a JSON body and return (status, response body)."""
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            reused = False
+
+        # Long-polls and short calls share connections; only touch the
+        # socket when the timeout actually changes
+        if conn.timeout != timeout:
+            conn.timeout = timeout
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+
+        try:
+            conn.request('POST', path, body=body,
+                         headers={'Content-Type': 'application/json', 'Connection': 'keep-alive'})
+            response = conn.getresponse()
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # The server closed the idle connection before answering, so it
+            # never saw the request; retry once on a fresh one
+            return self.post(path, body, timeout)
+        except (http.client.HTTPException, OSError):
+            # Timeouts included: the server may have handled the request
+            conn.close()
+            raise
+
+        try:
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+        return response.status, data
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
 class RendezvousClient:
     """
     Client for rendezvous server that enables peer discovery by device ID.
     Privacy-preserving: only stores device_id -> connection_info mapping temporarily.
     """
 
+    # Seconds a lookup result is reused; misses expire sooner so a peer
+    # that comes online is found quickly
+    LOOKUP_TTL = 10
+    NEGATIVE_LOOKUP_TTL = 2
+
     def __init__(self, server_host: str = 'rendezvous.ghostline.local',
-                 server_port: int = 8080):
+                 server_port: int = 8080, session: RendezvousSession = None):
         """Initialize rendezvous client."""
         self.server_host = server_host
         self.server_port = server_port
+        self._owns_session = session is None
+        self.session = session or RendezvousSession(server_host, server_port)
         self.registered = False
         self.heartbeat_thread = None
         self.running = False
+        self._stop_event = threading.Event()  # Wakes the heartbeat thread on unregister
+
+        # device_id -> (device_info or None, expiry)
+        self._lookup_cache: Dict[str, Tuple[Optional[Dict], float]] = {}
+        self._lookup_lock = threading.Lock()
 
     def register_device(self, device_id: str, public_ip: str, public_port: int,
                        local_ip: str = None, local_port: int = None) -> bool:
@@ -202,6 +407,7 @@ class RendezvousClient:
 
             # Send to rendezvous server
             response = self._send_request(registration)
+            self._invalidate_lookup(device_id)
 
             if response and response.get('status') == 'ok':
                 self.registered = True
@@ -214,11 +420,33 @@ class RendezvousClient:
             print(f"Registration failed: {e}")
             return False
 
-    def lookup_device(self, device_id: str) -> Optional[Dict]:
+    def lookup_device(self, device_id: str, bypass_cache: bool = False) -> Optional[Dict]:
         """
         Look up connection info for a device ID.
+        Results are cached briefly; bypass_cache forces a fresh lookup.
         Returns dict with public_addr and local_addr or None.
         """
+        if not bypass_cache:
+            with self._lookup_lock:
+                cached = self._lookup_cache.get(device_id)
+            if cached and time.monotonic() < cached[1]:
+                return cached[0]
+
+        device_info = self._lookup_device(device_id)
+
+        ttl = self.LOOKUP_TTL if device_info else self.NEGATIVE_LOOKUP_TTL
+        with self._lookup_lock:
+            self._lookup_cache[device_id] = (device_info, time.monotonic() + ttl)
+
+        return device_info
+
+    def _invalidate_lookup(self, device_id: str):
+        """Drop any cached lookup result for a device."""
+        with self._lookup_lock:
+            self._lookup_cache.pop(device_id, None)
+
+    def _lookup_device(self, device_id: str) -> Optional[Dict]:
+        """Ask the rendezvous server for a device's connection info."""
         try:
             request = {
                 'action': 'lookup',
@@ -261,9 +489,11 @@ class RendezvousClient:
             print(f"Connect request failed: {e}")
             return None
 
-    def get_connect_requests(self, device_id: str) -> list:
+    def get_connect_requests(self, device_id: str, wait: float = 0) -> list:
         """
         Get pending connection requests for this device.
+        With wait > 0 the server holds the call until a request arrives or
+        wait seconds pass (long-polling).
         Returns list of requests with requester info.
         """
         try:
@@ -272,8 +502,10 @@ class RendezvousClient:
                 'device_id': device_id,
                 'timestamp': time.time()
             }
+            if wait:
+                request['wait'] = wait
 
-            response = self._send_request(request)
+            response = self._send_request(request, timeout=5 + wait)
 
             if response and response.get('status') == 'ok':
                 return response.get('requests', [])
@@ -305,6 +537,7 @@ class RendezvousClient:
         """Unregister device from rendezvous server."""
         try:
             self.running = False
+            self._stop_event.set()
             if self.heartbeat_thread:
                 self.heartbeat_thread.join(timeout=2)
 
@@ -316,27 +549,42 @@ class RendezvousClient:
 
             self._send_request(request)
             self.registered = False
+            self._invalidate_lookup(device_id)
+
+            # A shared session is closed by whoever passed it in
+            if self._owns_session:
+                self.session.close()
 
         except Exception as e:
             print(f"Unregister failed: {e}")
 
-    def _send_request(self, request: dict) -> Optional[dict]:
+    def batch(self, requests: list, timeout: float = 5) -> list:
+        """
+        Send several API calls in one request to /api/batch.
+        Returns one response dict per call, in order (None if the batch failed).
+        """
+        response = self._send_request({'batch': requests}, timeout=timeout, path='/api/batch')
+
+        if response and response.get('status') == 'ok':
+            return response.get('responses', [])
+
+        return [None] * len(requests)
+
+    def _send_heartbeat(self, heartbeat: dict):
+        """Send one heartbeat request."""
+        self._send_request(heartbeat)
+
+    def _send_request(self, request: dict, timeout: float = 5, path: str = '/api') -> Optional[dict]:
         """Send request to rendezvous server (HTTP-like protocol)."""
         try:
             # For now, use a simple HTTP POST-like request
             # In production, this should use HTTPS with certificate pinning
-            import urllib.request
-            import urllib.parse
+            data = orjson.dumps(request) if orjson is not None else json.dumps(request).encode('utf-8')
+            status, body = self.session.post(path, data, timeout=timeout)
+            if status >= 400:
+                raise http.client.HTTPException(f"HTTP Error {status}")
 
-            url = f"http://{self.server_host}:{self.server_port}/api"
-            data = json.dumps(request).encode('utf-8')
-
-            req = urllib.request.Request(url, data=data,
-                                        headers={'Content-Type': 'application/json'})
-            req.timeout = 5
-
-            with urllib.request.urlopen(req, timeout=5) as response:
-                return json.loads(response.read().decode('utf-8'))
+            return orjson.loads(body) if orjson is not None else json.loads(body)
 
         except Exception as e:
             # Rendezvous server might not be available - this is OK
@@ -348,11 +596,11 @@ class RendezvousClient:
                         local_ip: str = None, local_port: int = None):
         """Start heartbeat to keep registration alive."""
         self.running = True
+        self._stop_event.clear()
 
         def heartbeat_loop():
             while self.running:
-                time.sleep(60)  # Heartbeat every 60 seconds
-                if not self.running:
+                if self._stop_event.wait(60):  # Heartbeat every 60 seconds
                     break
 
                 try:
@@ -363,7 +611,7 @@ class RendezvousClient:
                         'local_addr': {'ip': local_ip, 'port': local_port} if local_ip else None,
                         'timestamp': time.time()
                     }
-                    self._send_request(heartbeat)
+                    self._send_heartbeat(heartbeat)
                 except:
                     pass
 
@@ -371,22 +619,120 @@ class RendezvousClient:
         self.heartbeat_thread.start()
 
 
+class BatchingRendezvousClient(RendezvousClient):
+    """
+    Rendezvous client that gathers lookups made close together into one
+    /api/batch request, and sends lookups queued at heartbeat time along
+    with the heartbeat. lookup_device still blocks until its answer arrives.
+    """
+
+    MAX_BATCH = 16      # Lookups that trigger an immediate flush
+    BATCH_DELAY = 0.1   # Seconds the first queued lookup waits for company
+
+    def __init__(self, server_host: str = 'rendezvous.ghostline.local',
+                 server_port: int = 8080, session: RendezvousSession = None):
+        """Initialize batching rendezvous client."""
+        super().__init__(server_host, server_port, session)
+        self._pending_lookups = []  # (request, future)
+        self._batch_lock = threading.Lock()
+        self._batch_timer = None
+
+    def _lookup_device(self, device_id: str) -> Optional[Dict]:
+        """Queue a lookup for the next batch and wait for its answer."""
+        future = concurrent.futures.Future()
+        request = {
+            'action': 'lookup',
+            'device_id': device_id,
+            'timestamp': time.time()
+        }
+
+        with self._batch_lock:
+            self._pending_lookups.append((request, future))
+            flush_now = len(self._pending_lookups) >= self.MAX_BATCH
+            if not flush_now and self._batch_timer is None:
+                self._batch_timer = threading.Timer(self.BATCH_DELAY, self._flush_lookups)
+                self._batch_timer.daemon = True
+                self._batch_timer.start()
+
+        if flush_now:
+            self._flush_lookups()
+
+        response = future.result()
+        if response and response.get('status') == 'ok':
+            return response.get('device_info')
+
+        return None
+
+    def _take_pending_lookups(self) -> list:
+        """Remove and return the queued lookups, cancelling the flush timer."""
+        with self._batch_lock:
+            pending = self._pending_lookups
+            self._pending_lookups = []
+            if self._batch_timer:
+                self._batch_timer.cancel()
+                self._batch_timer = None
+        return pending
+
+    def _flush_lookups(self):
+        """Send all queued lookups in one batch."""
+        self._answer(self._take_pending_lookups(), [])
+
+    def _send_heartbeat(self, heartbeat: dict):
+        """Send the heartbeat together with any queued lookups."""
+        self._answer(self._take_pending_lookups(), [heartbeat])
+
+    def _answer(self, pending: list, leading: list):
+        """Batch the leading requests and queued lookups, then resolve each lookup."""
+        if not pending and not leading:
+            return
+
+        try:
+            responses = self.batch(leading + [request for request, _ in pending])
+        except Exception as e:
+            print(f"Lookup failed: {e}")
+            responses = []
+
+        lookup_responses = responses[len(leading):]
+        for index, (_, future) in enumerate(pending):
+            future.set_result(lookup_responses[index] if index < len(lookup_responses) else None)
+
+
 class HolePuncher:
     """Implements UDP/TCP hole punching for NAT traversal."""
 
     @staticmethod
-    def punch_hole_tcp(local_port: int, remote_ip: str, remote_port: int,
+    def create_punch_socket(local_port: int) -> socket.socket:
+        """
+        Create a TCP socket for hole punching, bound to local_port when that
+        port is free. While the P2P listener holds it the socket falls back to
+        an ephemeral port: the listener deliberately does not set SO_REUSEPORT,
+        which would let other processes bind it and take inbound connections.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(('0.0.0.0', local_port))
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                sock.bind(('0.0.0.0', 0))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def punch_hole_tcp(sock: socket.socket, remote_ip: str, remote_port: int,
                       timeout: int = 10) -> Optional[socket.socket]:
         """
-        Attempt TCP hole punching.
-        Returns connected socket or None.
+        Attempt TCP hole punching from an already bound socket
+        (see create_punch_socket).
+        Returns the connected socket, or None after closing it.
         """
         # TCP hole punching is more complex and less reliable than UDP
         # This is a simplified version
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            sock.bind(('0.0.0.0', local_port))
             sock.settimeout(timeout)
 
             # Attempt to connect
@@ -395,13 +741,45 @@ class HolePuncher:
 
         except Exception as e:
             print(f"Hole punching failed: {e}")
+            sock.close()
             return None
 
     @staticmethod
-    def simultaneous_connect(local_port: int, remote_ip: str, remote_port: int) -> Optional[socket.socket]:
+    def simultaneous_connect(local_port: int, remote_ip: str, remote_port: int,
+                             start_at: float = None, attempts: int = 3,
+                             interval: float = 1.0, timeout: int = 10) -> Optional[socket.socket]:
         """
         Attempt simultaneous TCP connect for hole punching.
-        Both peers must attempt at roughly the same time.
+        Both peers must attempt at roughly the same time: start_at is the
+        agreed wall-clock time (now if not given). Attempts run one after
+        another from a fresh socket, interval seconds apart, so a SYN dropped
+        before the peer's NAT opened its mapping is sent again. All attempts
+        share the timeout. Returns the connected socket or None.
         """
-        # This requires coordination - implemented in connection broker
-        pass
+        start_at = start_at or time.time()
+        deadline = start_at + timeout
+
+        for index in range(attempts):
+            delay = start_at + index * interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+            try:
+                sock = HolePuncher.create_punch_socket(local_port)
+            except OSError as e:
+                print(f"Hole punching failed: {e}")
+                return None
+
+            # Give up on this SYN when the next attempt is due
+            if index < attempts - 1:
+                remaining = min(remaining, interval)
+
+            sock = HolePuncher.punch_hole_tcp(sock, remote_ip, remote_port, remaining)
+            if sock is not None:
+                return sock
+
+        return None
@@ -6,9 +6,63 @@ Implements randomized packet sizes, variable timing, and indistinguishable paylo
 import os
 import time
 import random
+import struct
+import threading
 from typing import List
 
 
+# Random header (16), type (1), message length (4), footer length (2)
+_HDR = struct.Struct('>16sBIH')
+
+
+class _FillerRNG:
+    """
+    Random filler for headers, footers, padding and decoys, cut from a
+    ChaCha20 keystream seeded from os.urandom. Not for keys or nonces.
+    """
+
+    BUFFER_SIZE = 1 << 20   # Keystream generated per refill
+    REKEY_BYTES = 64 << 20  # Fresh key and nonce after this much output
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encryptor = None
+        self._generated = 0
+        self._buffer = b''
+        self._pos = 0
+
+    def _keystream(self, size: int) -> bytes:
+        """Generate size keystream bytes, rekeying when due. Caller holds the lock."""
+        if self._encryptor is None or self._generated >= self.REKEY_BYTES:
+            # Imported lazily so importing the package does not load cryptography
+            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms
+
+            cipher = Cipher(algorithms.ChaCha20(os.urandom(32), os.urandom(16)), mode=None)
+            self._encryptor = cipher.encryptor()
+            self._generated = 0
+
+        self._generated += size
+        return self._encryptor.update(bytes(size))
+
+    def randbytes(self, size: int) -> bytes:
+        """Return size random filler bytes."""
+        with self._lock:
+            if size > self.BUFFER_SIZE:
+                return self._keystream(size)
+
+            if self._pos + size > len(self._buffer):
+                self._buffer = self._keystream(self.BUFFER_SIZE)
+                self._pos = 0
+
+            start = self._pos
+            self._pos += size
+            return self._buffer[start:self._pos]
+
+
+_filler = _FillerRNG()
+_randbytes = _filler.randbytes  # Bound once; called for every frame
+
+
 class TrafficObfuscator:
     """Obfuscates network traffic to prevent pattern analysis."""
 
@@ -30,34 +84,44 @@ class TrafficObfuscator:
         offset = 0
         data_len = len(data)
 
-        while offset < data_len:
-            # Random packet size
-            packet_size = random.randint(
-                TrafficObfuscator.MIN_PACKET_SIZE,
-                TrafficObfuscator.MAX_PACKET_SIZE
-            )
-
-            # Extract chunk
-            chunk = data[offset:offset + packet_size]
-            offset += len(chunk)
-
-            # Pad to random size if needed
-            if len(chunk) < packet_size and offset >= data_len:
-                # Last packet - pad to random size
-                padding_size = packet_size - len(chunk)
-                chunk = chunk + os.urandom(padding_size)
+        sizes = range(TrafficObfuscator.MIN_PACKET_SIZE, TrafficObfuscator.MAX_PACKET_SIZE + 1)
+        mean_size = (TrafficObfuscator.MIN_PACKET_SIZE + TrafficObfuscator.MAX_PACKET_SIZE) // 2
 
-            packets.append(chunk)
+        while offset < data_len:
+            # Draw random packet sizes in batches roughly covering what is left
+            for packet_size in random.choices(sizes, k=(data_len - offset) // mean_size + 1):
+                end = offset + packet_size
+                if end >= data_len:
+                    # Last packet - pad to random size
+                    packets.append(data[offset:] + _randbytes(end - data_len))
+                    offset = data_len
+                    break
+
+                packets.append(data[offset:end])
+                offset = end
 
         # Add random decoy packets occasionally
         if random.random() < 0.3:  # 30% chance
-            decoy_count = random.randint(1, 3)
-            for _ in range(decoy_count):
-                decoy_size = random.randint(
-                    TrafficObfuscator.MIN_PACKET_SIZE,
-                    TrafficObfuscator.MAX_PACKET_SIZE
-                )
-                packets.insert(random.randint(0, len(packets)), os.urandom(decoy_size))
+            decoy_sizes = random.choices(sizes, k=random.randint(1, 3))
+            decoys = _randbytes(sum(decoy_sizes))
+
+            # Pick the decoy slots up front and interleave in one pass
+            # rather than inserting into the list one decoy at a time
+            total = len(packets) + len(decoy_sizes)
+            decoy_slots = set(random.sample(range(total), len(decoy_sizes)))
+
+            real = iter(packets)
+            start = 0
+            sizes_iter = iter(decoy_sizes)
+            interleaved = []
+            for slot in range(total):
+                if slot in decoy_slots:
+                    decoy_size = next(sizes_iter)
+                    interleaved.append(decoys[start:start + decoy_size])
+                    start += decoy_size
+                else:
+                    interleaved.append(next(real))
+            packets = interleaved
 
         return packets
 
@@ -83,40 +147,40 @@ class TrafficObfuscator:
                 TrafficObfuscator.MIN_PACKET_SIZE,
                 TrafficObfuscator.MAX_PACKET_SIZE
             )
-        return os.urandom(size)
+        return _randbytes(size)
 
     @staticmethod
     def wrap_message(message: bytes, message_type: int = 0x01) -> bytes:
         """
         Wrap message with metadata in a way that looks like generic data.
-        Format: [random_header (16 bytes)] [type (1 byte)] [length (4 bytes)] [message] [random_footer (variable)]
+        Format: [random_header (16 bytes)] [type (1 byte)] [length (4 bytes)] [footer_length (2 bytes)]
+                [message] [random_footer (footer_length bytes)]
         """
-        import struct
-
-        header = os.urandom(16)
-        length_bytes = struct.pack('>I', len(message))
-        type_byte = bytes([message_type])
+        return b''.join(TrafficObfuscator.build_iovec(message, message_type))
 
+    @staticmethod
+    def build_iovec(message: bytes, message_type: int = 0x01) -> List[bytes]:
+        """
+        Build a wrapped message as [header, message, footer] without joining them,
+        so it can be handed to sendmsg as separate buffers.
+        """
         # Random footer size
         footer_size = random.randint(16, 128)
-        footer = os.urandom(footer_size)
+        footer = _randbytes(footer_size)
 
-        return header + type_byte + length_bytes + message + footer
+        return [_HDR.pack(_randbytes(16), message_type, len(message), footer_size), message, footer]
 
     @staticmethod
     def unwrap_message(wrapped: bytes) -> tuple:
         """
         Unwrap message from obfuscated format.
-        Returns: (message_type, message_data)
+        Returns: (message_type, message_data, total_consumed)
         """
-        import struct
-
-        if len(wrapped) < 21:  # Minimum: 16 + 1 + 4
+        if len(wrapped) < _HDR.size:  # Minimum: 16 + 1 + 4 + 2
             raise ValueError("Wrapped message too short")
 
-        message_type = wrapped[16]
-        message_length = struct.unpack('>I', wrapped[17:21])[0]
+        _, message_type, message_length, footer_size = _HDR.unpack_from(wrapped, 0)
 
-        message_data = wrapped[21:21 + message_length]
+        message_data = wrapped[_HDR.size:_HDR.size + message_length]
 
-        return message_type, message_data
+        return message_type, message_data, _HDR.size + message_length + footer_size
@@ -7,14 +7,68 @@ import socket
 import threading
 import time
 import struct
+import heapq
+import itertools
+import selectors
+from collections import deque
 from typing import Callable, Optional, Dict
 from queue import Queue
 from .obfuscation import TrafficObfuscator
 
 
+# Type (1), message length (4) and footer length (2) of a wrapped message,
+# after its 16-byte random header
+_WRAP_HEADER = struct.Struct('>16xBIH')
+
+# Length prefix of each message in a batch
+_BATCH_LENGTH = struct.Struct('>I')
+
+
+class _PeerState:
+    """Buffers of one peer connection. Received data is appended at tail and
+    consumed from head, so neither step copies what is already buffered;
+    tx holds the buffers still to be written, oldest first."""
+
+    __slots__ = ('peer_id', 'sock', 'rx', 'view', 'head', 'tail', 'tx', 'tx_bytes', 'events')
+
+    def __init__(self, peer_id: str, sock: socket.socket, size: int):
+        self.peer_id = peer_id
+        self.sock = sock
+        self.rx = bytearray(size)
+        self.view = memoryview(self.rx)
+        self.head = 0
+        self.tail = 0
+        self.tx = deque()
+        self.tx_bytes = 0
+        self.events = selectors.EVENT_READ
+
+    def compact(self):
+        """Move the unconsumed bytes to the front of the buffer."""
+        self.rx[:self.tail - self.head] = self.view[self.head:self.tail]
+        self.tail -= self.head
+        self.head = 0
+
+    def grow(self):
+        """Double the buffer, keeping its contents."""
+        grown = bytearray(len(self.rx) * 2)
+        grown[:self.tail] = self.view[:self.tail]
+        self.rx = grown
+        self.view = memoryview(grown)
+
+
 class P2PNode:
     """Peer-to-peer network node."""
 
+    WRAP_HEADER_SIZE = 23  # random header (16) + type (1) + length (4) + footer length (2)
+
+    MSG_TYPE_DATA = 0x01   # One application message
+    MSG_TYPE_BATCH = 0x02  # Length-prefixed application messages sent together
+
+    RX_BUFFER_SIZE = 65536        # Initial per-peer receive buffer
+    RX_COMPACT_THRESHOLD = 32768  # Consumed bytes tolerated before compacting
+    TX_BUFFER_LIMIT = 8 * 1024 * 1024  # Unsent bytes per peer before it is dropped
+    IOV_MAX = 64                  # Buffers handed to one sendmsg call
+
     def __init__(self, host: str = '0.0.0.0', port: int = 0):
         """Initialize P2P node."""
         self.host = host
@@ -24,9 +78,27 @@ class P2PNode:
         self.peers: Dict[str, socket.socket] = {}
         self.message_callback: Optional[Callable] = None
         self.connection_callback: Optional[Callable] = None
+        self.connection_listeners: list = []  # Extra connection event observers
+        self.peer_version = 0  # Bumped whenever a peer is added
         self.obfuscator = TrafficObfuscator()
         self.message_queue = Queue()
         self._lock = threading.Lock()
+        self.recv_chunk_size = 4096
+
+        # Jittered sends wait here for the sender thread, which hands them to
+        # the event loop once due: (send_at, sequence, peer_id, socket, frame buffers)
+        self._send_heap: list = []
+        self._send_cv = threading.Condition()
+        self._send_sequence = itertools.count()
+        self._last_send_at: Dict[str, float] = {}  # Keeps sends to one peer in order
+        self._sender_thread = None
+
+        # Event loop serving the listening socket and every peer
+        self._selector = None
+        self._loop_thread = None
+        self._pending_peers: list = []  # Connected elsewhere, not yet registered
+        self._outgoing: list = []       # (socket, frame) due to be written
+        self._wakeup_recv = self._wakeup_send = None
 
     def start(self):
         """Start the P2P node server."""
@@ -38,17 +110,39 @@ class P2PNode:
         self.port = self.server_socket.getsockname()[1]
 
         self.server_socket.listen(5)
+        self.server_socket.setblocking(False)
         self.running = True
 
-        # Start server thread
-        server_thread = threading.Thread(target=self._accept_connections, daemon=True)
-        server_thread.start()
+        # One event loop accepts connections and reads from every peer
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._selector.register(self.server_socket, selectors.EVENT_READ)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+
+        self._loop_thread = threading.Thread(target=self._event_loop, daemon=True)
+        self._loop_thread.start()
+
+        # Start sender thread
+        self._sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self._sender_thread.start()
 
     def stop(self):
         """Stop the P2P node."""
         self.running = False
 
-        # Close all peer connections
+        # Let the sender thread hand over whatever is still scheduled
+        with self._send_cv:
+            self._send_cv.notify()
+        if self._sender_thread:
+            self._sender_thread.join(timeout=2)
+
+        # The event loop closes every peer connection on its way out
+        if self._loop_thread:
+            self._wake_loop()
+            self._loop_thread.join(timeout=2)
+
+        # Close any peer the loop never picked up
         with self._lock:
             for peer_id, sock in list(self.peers.items()):
                 try:
@@ -64,55 +158,101 @@ class P2PNode:
             except:
                 pass
 
-    def _accept_connections(self):
-        """Accept incoming peer connections."""
-        while self.running:
-            try:
-                self.server_socket.settimeout(1.0)
-                client_socket, address = self.server_socket.accept()
+        if self._selector:
+            for sock in (self._wakeup_recv, self._wakeup_send):
+                sock.close()
+            self._selector.close()
+            self._selector = None
+
+    def _wake_loop(self):
+        """Interrupt the event loop's select call."""
+        try:
+            self._wakeup_send.send(b'\0')
+        except OSError:
+            pass
+
+    def _event_loop(self):
+        """Accept connections, read from and write to every peer on one thread."""
+        selector = self._selector
+        server_socket = self.server_socket
 
-                # Handle connection in separate thread
-                peer_id = f"{address[0]}:{address[1]}"
+        try:
+            while self.running:
+                # Pick up sockets and frames added from other threads; taken
+                # together so a new peer is registered before its first frame
                 with self._lock:
-                    self.peers[peer_id] = client_socket
+                    added, self._pending_peers = self._pending_peers, []
+                    outgoing, self._outgoing = self._outgoing, []
+                for state in added:
+                    selector.register(state.sock, selectors.EVENT_READ, state)
+                self._queue_outgoing(outgoing)
+
+                for key, mask in selector.select():
+                    if key.fileobj is server_socket:
+                        self._accept_connection()
+                    elif key.data is None:
+                        # Wakeup: drain the bytes
+                        try:
+                            while self._wakeup_recv.recv(64):
+                                pass
+                        except OSError:
+                            pass
+                    elif ((mask & selectors.EVENT_READ and not self._read_peer(key.data)) or
+                          (mask & selectors.EVENT_WRITE and not self._flush_peer(key.data))):
+                        self._close_peer(key.data)
+
+        except Exception as e:
+            if self.running:
+                print(f"P2P event loop stopped: {e}")
+
+        finally:
+            # Write out what the sender thread handed over while stopping,
+            # as far as the socket buffers take it
+            if self._sender_thread and not self.running:
+                self._sender_thread.join(timeout=2)
+            with self._lock:
+                outgoing, self._outgoing = self._outgoing, []
+            self._queue_outgoing(outgoing)
+
+            for key in list(selector.get_map().values()):
+                if isinstance(key.data, _PeerState):
+                    self._close_peer(key.data)
 
-                thread = threading.Thread(
-                    target=self._handle_peer,
-                    args=(peer_id, client_socket),
-                    daemon=True
-                )
-                thread.start()
+    def _accept_connection(self):
+        """Accept one incoming peer connection."""
+        try:
+            client_socket, address = self.server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            if self.running:
+                print(f"Error accepting connection: {e}")
+            return
 
-                if self.connection_callback:
-                    self.connection_callback(peer_id, 'connected')
+        peer_id = f"{address[0]}:{address[1]}"
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        state = self._new_peer_state(peer_id, client_socket)
+        with self._lock:
+            self.peers[peer_id] = client_socket
+            self.peer_version += 1
 
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    print(f"Error accepting connection: {e}")
+        # Already on the loop thread, so register directly
+        self._selector.register(client_socket, selectors.EVENT_READ, state)
+
+        self._notify_connection(peer_id, 'connected')
 
     def connect_to_peer(self, host: str, port: int, timeout: int = 5) -> str:
         """Connect to a remote peer."""
         try:
             peer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            peer_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             peer_socket.settimeout(timeout)
             peer_socket.connect((host, port))
 
             peer_id = f"{host}:{port}"
-            with self._lock:
-                self.peers[peer_id] = peer_socket
+            self._add_peer(peer_id, peer_socket)
 
-            # Start handling this peer
-            thread = threading.Thread(
-                target=self._handle_peer,
-                args=(peer_id, peer_socket),
-                daemon=True
-            )
-            thread.start()
-
-            if self.connection_callback:
-                self.connection_callback(peer_id, 'connected')
+            self._notify_connection(peer_id, 'connected')
 
             return peer_id
 
@@ -121,81 +261,135 @@ class P2PNode:
 
     def add_connected_socket(self, sock: socket.socket, peer_id: str) -> str:
         """Add an already-connected socket as a peer (e.g., from hole punching)."""
-        with self._lock:
-            self.peers[peer_id] = sock
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._add_peer(peer_id, sock)
 
-        # Start handling this peer
-        thread = threading.Thread(
-            target=self._handle_peer,
-            args=(peer_id, sock),
-            daemon=True
-        )
-        thread.start()
-
-        if self.connection_callback:
-            self.connection_callback(peer_id, 'connected')
+        self._notify_connection(peer_id, 'connected')
 
         return peer_id
 
-    def _handle_peer(self, peer_id: str, sock: socket.socket):
-        """Handle communication with a peer."""
-        buffer = b''
+    def _new_peer_state(self, peer_id: str, sock: socket.socket) -> '_PeerState':
+        """Prepare a connected socket for the event loop."""
+        # The event loop only reads or writes once the selector reports the
+        # socket ready, so one stalled peer never holds up the others
+        sock.setblocking(False)
+        return _PeerState(peer_id, sock, self.RX_BUFFER_SIZE)
 
-        while self.running:
-            try:
-                # Receive data
-                sock.settimeout(1.0)
-                data = sock.recv(4096)
-
-                if not data:
-                    break
-
-                buffer += data
+    def _add_peer(self, peer_id: str, sock: socket.socket):
+        """Hand a socket connected on another thread to the event loop."""
+        state = self._new_peer_state(peer_id, sock)
+        with self._lock:
+            self.peers[peer_id] = sock
+            self.peer_version += 1
+            self._pending_peers.append(state)
+        self._wake_loop()
+
+    def _read_peer(self, state: '_PeerState') -> bool:
+        """Read what a peer has sent and dispatch complete messages. False once it is gone."""
+        if state.tail == len(state.rx):
+            if state.head:
+                # Move the unconsumed bytes to the front
+                state.compact()
+            else:
+                # A single message fills the buffer; grow it
+                state.grow()
 
-                # Try to extract complete messages
-                while len(buffer) >= 21:  # Minimum wrapped message size
-                    try:
-                        # Unwrap message
-                        msg_type, msg_data = self.obfuscator.unwrap_message(buffer)
+        try:
+            received = state.sock.recv_into(state.view[state.tail:state.tail + self.recv_chunk_size])
+        except (BlockingIOError, InterruptedError):
+            return True
+        except Exception:
+            return False
+
+        if not received:
+            return False
+
+        state.tail += received
+
+        header_size = self.WRAP_HEADER_SIZE
+        unpack_header = _WRAP_HEADER.unpack_from
+        rx, view = state.rx, state.view
+        head, tail = state.head, state.tail
+        peer_id = state.peer_id
+
+        # Extract every complete message
+        while tail - head >= header_size:
+            msg_type, msg_length, footer_length = unpack_header(rx, head)
+            end = head + header_size + msg_length
+            if end + footer_length > tail:
+                # Wait until the whole frame has arrived
+                break
 
-                        # Calculate consumed bytes
-                        consumed = 21 + len(msg_data) + (len(buffer) - 21 - len(msg_data))
-                        buffer = buffer[consumed:]
+            msg_data = view[head + header_size:end]
+            head = end + footer_length
 
-                        # Process message
-                        if self.message_callback and msg_type == 0x01:  # Real message
-                            self.message_callback(peer_id, msg_data)
+            # Process message
+            try:
+                if self.message_callback and msg_type == self.MSG_TYPE_DATA:  # Real message
+                    self.message_callback(peer_id, bytes(msg_data))
+                elif self.message_callback and msg_type == self.MSG_TYPE_BATCH:
+                    for message in self._split_batch(msg_data):
+                        self.message_callback(peer_id, message)
+            except Exception:
+                pass
 
-                        break  # Process one message at a time
+        state.head = head
+        if head == tail:
+            state.head = state.tail = 0
+        elif head > self.RX_COMPACT_THRESHOLD:
+            state.compact()
 
-                    except ValueError:
-                        # Not enough data yet
-                        break
-                    except Exception as e:
-                        # Corrupted message, skip some bytes
-                        buffer = buffer[1:]
-                        break
+        return True
 
-            except socket.timeout:
-                continue
-            except Exception as e:
-                break
+    def _close_peer(self, state: '_PeerState'):
+        """Forget a peer whose connection has closed."""
+        try:
+            self._selector.unregister(state.sock)
+        except (KeyError, ValueError):
+            pass
 
-        # Connection closed
         with self._lock:
-            if peer_id in self.peers:
-                del self.peers[peer_id]
+            if self.peers.get(state.peer_id) is state.sock:
+                del self.peers[state.peer_id]
+
+        with self._send_cv:
+            self._last_send_at.pop(state.peer_id, None)
 
+        state.tx.clear()
         try:
-            sock.close()
+            state.sock.close()
         except:
             pass
 
-        if self.connection_callback:
-            self.connection_callback(peer_id, 'disconnected')
+        self._notify_connection(state.peer_id, 'disconnected')
+
+    @staticmethod
+    def _split_batch(data) -> list:
+        """Split a batch payload into its length-prefixed messages."""
+        messages = []
+        offset = 0
+        while offset + 4 <= len(data):
+            length = _BATCH_LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            messages.append(bytes(data[offset:offset + length]))
+            offset += length
+        return messages
 
     def send_message(self, peer_id: str, message: bytes):
         """Send a message to a peer with obfuscation."""
+        self.send_raw(peer_id, message, self.MSG_TYPE_DATA)
+
+    def send_messages(self, peer_id: str, messages: list):
+        """Send several messages to a peer in a single wrapped write."""
+        if len(messages) == 1:
+            self.send_message(peer_id, messages[0])
+            return
+
+        batch = b''.join(_BATCH_LENGTH.pack(len(message)) + message for message in messages)
+        self.send_raw(peer_id, batch, self.MSG_TYPE_BATCH)
+
+    def send_raw(self, peer_id: str, data: bytes, message_type: int):
+        """Wrap data as one obfuscated frame of the given type and send it to a peer."""
         with self._lock:
             if peer_id not in self.peers:
                 raise ValueError(f"Peer {peer_id} not connected")
@@ -203,42 +397,164 @@ class P2PNode:
             sock = self.peers[peer_id]
 
         # Wrap message with obfuscation
-        wrapped = self.obfuscator.wrap_message(message, message_type=0x01)
+        frame = self.obfuscator.build_iovec(data, message_type=message_type)
+
+        # Schedule the send after a timing jitter
+        with self._send_cv:
+            self._schedule_send(peer_id, sock, frame)
+            self._send_cv.notify()
+
+    def broadcast_message(self, message: bytes, distinct_wrap: bool = False):
+        """
+        Broadcast a message to all connected peers.
+        The message is wrapped once and the same bytes go to every peer;
+        pass distinct_wrap=True to give each peer its own random wrapping.
+        """
+        with self._lock:
+            peers = list(self.peers.items())
 
-        # Add timing jitter
-        jitter = self.obfuscator.add_timing_jitter()
-        time.sleep(jitter)
+        frame = None if distinct_wrap else self.obfuscator.build_iovec(message, message_type=self.MSG_TYPE_DATA)
 
-        # Send message
-        try:
-            sock.sendall(wrapped)
-        except Exception as e:
-            raise ConnectionError(f"Failed to send message to {peer_id}: {e}")
+        # Every peer gets its own jitter, so the sends go out in parallel
+        with self._send_cv:
+            for peer_id, sock in peers:
+                peer_frame = frame or self.obfuscator.build_iovec(message, message_type=self.MSG_TYPE_DATA)
+                self._schedule_send(peer_id, sock, peer_frame)
+            self._send_cv.notify()
 
-    def broadcast_message(self, message: bytes):
-        """Broadcast a message to all connected peers."""
-        with self._lock:
-            peer_ids = list(self.peers.keys())
+    def _schedule_send(self, peer_id: str, sock: socket.socket, frame: list):
+        """Queue a wrapped frame for the sender thread. Caller holds _send_cv."""
+        send_at = time.monotonic() + self.obfuscator.add_timing_jitter()
+
+        # Never overtake a frame already scheduled for the same peer
+        send_at = max(send_at, self._last_send_at.get(peer_id, 0.0))
+        self._last_send_at[peer_id] = send_at
 
-        for peer_id in peer_ids:
+        heapq.heappush(self._send_heap, (send_at, next(self._send_sequence), peer_id, sock, frame))
+
+    def _sender_loop(self):
+        """Hand scheduled frames to the event loop once their jitter has elapsed."""
+        heap = self._send_heap
+        cv = self._send_cv
+
+        while True:
+            with cv:
+                while True:
+                    if heap and (not self.running or heap[0][0] <= time.monotonic()):
+                        break
+                    if not self.running:
+                        return
+                    cv.wait(heap[0][0] - time.monotonic() if heap else None)
+
+                # Everything that is due (all of it when stopping)
+                due = []
+                now = time.monotonic()
+                while heap and (not self.running or heap[0][0] <= now):
+                    _, _, _, sock, frame = heapq.heappop(heap)
+                    due.append((sock, frame))
+
+            with self._lock:
+                self._outgoing.extend(due)
+            self._wake_loop()
+
+    def _queue_outgoing(self, outgoing: list):
+        """Append frames handed over by the sender thread to their peers' buffers
+        and write as much as each socket takes. Event loop only."""
+        flush = {}
+        for sock, frame in outgoing:
+            try:
+                state = self._selector.get_key(sock).data
+            except (KeyError, ValueError):
+                continue  # Peer already gone
+
+            state.tx.extend(frame)
+            state.tx_bytes += sum(len(part) for part in frame)
+            flush[state.peer_id] = state
+
+        for state in flush.values():
+            if state.tx_bytes > self.TX_BUFFER_LIMIT:
+                print(f"Failed to send message to {state.peer_id}: send buffer full")
+                self._close_peer(state)
+            elif not self._flush_peer(state):
+                self._close_peer(state)
+
+    def _flush_peer(self, state: '_PeerState') -> bool:
+        """Write a peer's pending buffers until its socket is full. False once it is gone."""
+        sock = state.sock
+        tx = state.tx
+
+        while tx:
             try:
-                self.send_message(peer_id, message)
-            except Exception as e:
-                print(f"Failed to send to {peer_id}: {e}")
+                if hasattr(sock, 'sendmsg'):
+                    sent = sock.sendmsg(list(itertools.islice(tx, self.IOV_MAX)))
+                else:  # Windows
+                    sent = sock.send(tx[0])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                print(f"Failed to send message to {state.peer_id}: {e}")
+                return False
+
+            # Drop what was written, keeping the unsent tail of a partial buffer
+            state.tx_bytes -= sent
+            while sent:
+                part = tx[0]
+                if sent < len(part):
+                    tx[0] = memoryview(part)[sent:]
+                    break
+                sent -= len(part)
+                tx.popleft()
+
+        # Only watch for buffer space while something is waiting for it
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if tx else selectors.EVENT_READ
+        if events != state.events:
+            self._selector.modify(sock, events, state)
+            state.events = events
+
+        return True
 
     def set_message_callback(self, callback: Callable):
         """Set callback for received messages: callback(peer_id, message)"""
         self.message_callback = callback
 
+    def set_recv_chunk_size(self, size: int):
+        """Set how many bytes each peer connection reads per recv call."""
+        if size <= 0:
+            raise ValueError("Receive chunk size must be positive")
+        self.recv_chunk_size = size
+
     def set_connection_callback(self, callback: Callable):
         """Set callback for connection events: callback(peer_id, event)"""
         self.connection_callback = callback
 
+    def add_connection_listener(self, listener: Callable):
+        """Also call listener(peer_id, event) on connection events."""
+        with self._lock:
+            self.connection_listeners = self.connection_listeners + [listener]
+
+    def remove_connection_listener(self, listener: Callable):
+        """Stop calling a listener added with add_connection_listener."""
+        with self._lock:
+            self.connection_listeners = [l for l in self.connection_listeners if l is not listener]
+
+    def _notify_connection(self, peer_id: str, event: str):
+        """Report a connection event to the callback and any listeners."""
+        if self.connection_callback:
+            self.connection_callback(peer_id, event)
+        for listener in self.connection_listeners:
+            listener(peer_id, event)
+
     def get_peer_list(self) -> list:
         """Get list of connected peer IDs."""
         with self._lock:
             return list(self.peers.keys())
 
+    @property
+    def peer_count(self) -> int:
+        """Number of connected peers."""
+        with self._lock:
+            return len(self.peers)
+
     def get_address(self) -> tuple:
         """Get the node's listening address."""
         return (self.host, self.port)
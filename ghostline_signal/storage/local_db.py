@@ -4,15 +4,100 @@ All messages are stored locally with no cloud sync.
 """
 
 import json
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Optional
-
+from time import time as _now
+from typing import Iterator, List, Dict, Optional
+
+
+# Query text lives at module level so every call hands sqlite3 the same string
+# and hits the connection's prepared-statement cache
+_INSERT_MESSAGE_SQL = '''
+    INSERT INTO messages (peer_id, content, timestamp, direction, session_id, delivered)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# The inner query takes the newest rows off idx_messages_peer_ts; the outer
+# one puts them back in chronological order.
+_SELECT_MESSAGES_SQL = '''
+    SELECT id, content, timestamp, direction, session_id, delivered
+    FROM (
+        SELECT id, content, timestamp, direction, session_id, delivered
+        FROM messages
+        WHERE peer_id = ?
+        ORDER BY timestamp DESC
+        LIMIT ?
+    )
+    ORDER BY timestamp ASC
+'''
+
+_UPSERT_PEER_SQL = '''
+    INSERT INTO peers (peer_id, display_name, public_key, first_seen, last_seen, trust_level)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(peer_id) DO UPDATE SET
+        display_name = excluded.display_name,
+        public_key = excluded.public_key,
+        last_seen = excluded.last_seen,
+        trust_level = excluded.trust_level
+'''
+
+_SELECT_PEER_SQL = '''
+    SELECT peer_id, display_name, public_key, first_seen, last_seen, trust_level
+    FROM peers
+    WHERE peer_id = ?
+'''
+
+_SELECT_ALL_PEERS_SQL = '''
+    SELECT peer_id, display_name, public_key, first_seen, last_seen, trust_level
+    FROM peers
+    ORDER BY last_seen DESC
+'''
+
+_UPSERT_SESSION_SQL = '''
+    INSERT INTO sessions (session_id, peer_id, session_key, created_at, expires_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(session_id) DO UPDATE SET
+        peer_id = excluded.peer_id,
+        session_key = excluded.session_key,
+        created_at = excluded.created_at,
+        expires_at = excluded.expires_at
+'''
+
+_SELECT_SESSION_SQL = '''
+    SELECT session_id, peer_id, session_key, created_at, expires_at
+    FROM sessions
+    WHERE session_id = ?
+'''
+
+_SELECT_EXPIRED_SESSIONS_SQL = 'SELECT session_id FROM sessions WHERE expires_at < ?'
+_DELETE_EXPIRED_SESSIONS_SQL = 'DELETE FROM sessions WHERE expires_at < ?'
+_UPDATE_LAST_SEEN_SQL = 'UPDATE peers SET last_seen = ? WHERE peer_id = ?'
 
 class MessageStore:
     """Local storage for messages."""
 
+    # Per-connection settings; WAL mode itself is stored in the database file.
+    # WAL keeps messages.db-wal and messages.db-shm next to the database, so
+    # the storage directory must be on a local filesystem (not NFS/SMB).
+    CONNECTION_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA cache_size=-8000',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA busy_timeout=5000',
+    )
+
+    POOL_SIZE = 4  # Most connections open at once; more callers wait their turn
+    STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+
+    # File housekeeping (freeing pages, truncating the WAL) hits the disk, so
+    # it runs at most this often unless the WAL grows past WAL_MAX_BYTES
+    MAINTENANCE_INTERVAL = 3600  # Seconds
+    WAL_MAX_BYTES = 16 * 1024 * 1024
+
     def __init__(self, storage_path: str = None):
         """Initialize message store."""
         if storage_path is None:
@@ -22,57 +107,144 @@ class MessageStore:
 
         storage_path.parent.mkdir(parents=True, exist_ok=True)
         self.db_path = storage_path
+
+        # Bounded pool of long-lived connections shared by every thread,
+        # opened on demand up to POOL_SIZE
+        self._pool: 'queue.Queue[sqlite3.Connection]' = queue.Queue()
+        self._pool_lock = threading.Lock()
+        self._pool_opened = 0
+        self.pool_stats = {'checkouts': 0, 'waits': 0}  # 'waits' growing means the pool is too small
+
+        self._maintenance_lock = threading.Lock()
+        self._last_maintenance = _now()
+
         self._init_database()
 
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a connection with the connection pragmas applied."""
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False,
+                               cached_statements=self.STATEMENT_CACHE_SIZE)
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+        # Rows map column names in C, so results become dicts with one dict() call
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _checkout(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection for the duration of a with-block."""
+        try:
+            conn = self._pool.get_nowait()
+            waited = False
+        except queue.Empty:
+            with self._pool_lock:
+                can_open = self._pool_opened < self.POOL_SIZE
+                if can_open:
+                    self._pool_opened += 1
+            if can_open:
+                try:
+                    conn = self._open_connection()
+                except sqlite3.Error:
+                    with self._pool_lock:
+                        self._pool_opened -= 1
+                    raise
+            else:
+                conn = self._pool.get()
+            waited = not can_open
+
+        with self._pool_lock:
+            self.pool_stats['checkouts'] += 1
+            if waited:
+                self.pool_stats['waits'] += 1
+
+        try:
+            yield conn
+        finally:
+            # Never hand the next caller a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def close(self):
+        """Close the pooled connections; later calls open new ones."""
+        with self._pool_lock:
+            connections = []
+            while True:
+                try:
+                    connections.append(self._pool.get_nowait())
+                except queue.Empty:
+                    break
+            self._pool_opened -= len(connections)
+
+        for conn in connections:
+            try:
+                # Refresh planner statistics for tables whose shape changed
+                conn.execute('PRAGMA optimize')
+                conn.close()
+            except sqlite3.Error:
+                pass
+
     def _init_database(self):
         """Initialize SQLite database schema."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        # Messages table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                peer_id TEXT NOT NULL,
-                content BLOB NOT NULL,
-                timestamp REAL NOT NULL,
-                direction TEXT NOT NULL,
-                session_id TEXT,
-                delivered INTEGER DEFAULT 0
-            )
-        ''')
-
-        # Peers table (device identities)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS peers (
-                peer_id TEXT PRIMARY KEY,
-                display_name TEXT,
-                public_key BLOB NOT NULL,
-                first_seen REAL NOT NULL,
-                last_seen REAL,
-                trust_level INTEGER DEFAULT 0
-            )
-        ''')
-
-        # Sessions table (ephemeral session keys)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                session_id TEXT PRIMARY KEY,
-                peer_id TEXT NOT NULL,
-                session_key BLOB NOT NULL,
-                created_at REAL NOT NULL,
-                expires_at REAL NOT NULL,
-                FOREIGN KEY (peer_id) REFERENCES peers (peer_id)
-            )
-        ''')
-
-        # Create indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_peer ON messages(peer_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_peer ON sessions(peer_id)')
-
-        conn.commit()
-        conn.close()
+        with self._checkout() as conn:
+            cursor = conn.cursor()
+
+            # Let deleted pages be handed back to the filesystem. This only
+            # takes effect on a new database, before any table exists.
+            cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+
+            # Write-ahead logging: readers no longer block the writer, and a
+            # commit needs one fsync of the log instead of two of the journal
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+            # Messages table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    peer_id TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    timestamp REAL NOT NULL,
+                    direction TEXT NOT NULL,
+                    session_id TEXT,
+                    delivered INTEGER DEFAULT 0
+                )
+            ''')
+
+            # Peers table (device identities)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS peers (
+                    peer_id TEXT PRIMARY KEY,
+                    display_name TEXT,
+                    public_key BLOB NOT NULL,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL,
+                    trust_level INTEGER DEFAULT 0
+                )
+            ''')
+
+            # Sessions table (ephemeral session keys)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    peer_id TEXT NOT NULL,
+                    session_key BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    FOREIGN KEY (peer_id) REFERENCES peers (peer_id)
+                )
+            ''')
+
+            # Create indexes
+            # (peer_id, timestamp DESC) lets get_messages walk one peer's history
+            # newest-first and stop at LIMIT instead of sorting every row; it also
+            # serves plain peer_id lookups, so the old single-column index goes.
+            cursor.execute('DROP INDEX IF EXISTS idx_messages_peer')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_peer_ts ON messages(peer_id, timestamp DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_peer ON sessions(peer_id)')
+
+            conn.commit()
 
     def store_message(self, peer_id: str, content: bytes, direction: str,
                      session_id: str = None, delivered: bool = False) -> int:
@@ -81,175 +253,151 @@ class MessageStore:
         direction: 'sent' or 'received'
         Returns message ID.
         """
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        timestamp = datetime.now().timestamp()
+        timestamp = _now()
+        return self.store_messages_bulk([(peer_id, content, timestamp, direction, session_id, delivered)])[0]
 
-        cursor.execute('''
-            INSERT INTO messages (peer_id, content, timestamp, direction, session_id, delivered)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (peer_id, content, timestamp, direction, session_id, 1 if delivered else 0))
+    def store_messages_bulk(self, rows: List[tuple]) -> List[int]:
+        """
+        Store several messages in a single transaction.
+        rows: (peer_id, content, timestamp, direction, session_id, delivered) tuples
+        Returns the message IDs in the same order.
+        """
+        if not rows:
+            return []
 
-        message_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._checkout() as conn:
+            # One transaction on one connection, so the AUTOINCREMENT IDs are consecutive
+            with conn:
+                conn.executemany(_INSERT_MESSAGE_SQL, [
+                    (peer_id, content, timestamp, direction, session_id, 1 if delivered else 0)
+                    for peer_id, content, timestamp, direction, session_id, delivered in rows
+                ])
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
 
-        return message_id
+            return list(range(last_id - len(rows) + 1, last_id + 1))
 
     def get_messages(self, peer_id: str, limit: int = 100) -> List[Dict]:
         """Get messages for a specific peer."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT id, content, timestamp, direction, session_id, delivered
-            FROM messages
-            WHERE peer_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (peer_id, limit))
-
-        messages = []
-        for row in cursor.fetchall():
-            messages.append({
-                'id': row[0],
-                'content': row[1],
-                'timestamp': row[2],
-                'direction': row[3],
-                'session_id': row[4],
-                'delivered': bool(row[5])
-            })
-
-        conn.close()
-        return list(reversed(messages))  # Return in chronological order
+        return list(self.iter_messages(peer_id, limit))
+
+    def iter_messages(self, peer_id: str, limit: int = 100) -> Iterator[Dict]:
+        """
+        Yield the newest ``limit`` messages for a peer in chronological order.
+        Holds a pooled connection until the generator is exhausted or closed.
+        """
+        with self._checkout() as conn:
+            cursor = conn.execute(_SELECT_MESSAGES_SQL, (peer_id, limit))
+
+            for row in cursor:
+                message = dict(row)
+                message['delivered'] = bool(message['delivered'])
+                yield message
 
     def add_peer(self, peer_id: str, public_key: bytes, display_name: str = None,
                  trust_level: int = 0):
         """Add or update a peer."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        with self._checkout() as conn:
+            cursor = conn.cursor()
 
-        timestamp = datetime.now().timestamp()
+            timestamp = _now()
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO peers (peer_id, display_name, public_key, first_seen, last_seen, trust_level)
-            VALUES (?, ?, ?,
-                COALESCE((SELECT first_seen FROM peers WHERE peer_id = ?), ?),
-                ?, ?)
-        ''', (peer_id, display_name, public_key, peer_id, timestamp, timestamp, trust_level))
+            cursor.execute(_UPSERT_PEER_SQL,
+                           (peer_id, display_name, public_key, timestamp, timestamp, trust_level))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def get_peer(self, peer_id: str) -> Optional[Dict]:
         """Get peer information."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT peer_id, display_name, public_key, first_seen, last_seen, trust_level
-            FROM peers
-            WHERE peer_id = ?
-        ''', (peer_id,))
-
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            return {
-                'peer_id': row[0],
-                'display_name': row[1],
-                'public_key': row[2],
-                'first_seen': row[3],
-                'last_seen': row[4],
-                'trust_level': row[5]
-            }
-        return None
+        with self._checkout() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(_SELECT_PEER_SQL, (peer_id,))
+
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     def get_all_peers(self) -> List[Dict]:
         """Get all known peers."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT peer_id, display_name, public_key, first_seen, last_seen, trust_level
-            FROM peers
-            ORDER BY last_seen DESC
-        ''')
-
-        peers = []
-        for row in cursor.fetchall():
-            peers.append({
-                'peer_id': row[0],
-                'display_name': row[1],
-                'public_key': row[2],
-                'first_seen': row[3],
-                'last_seen': row[4],
-                'trust_level': row[5]
-            })
-
-        conn.close()
-        return peers
+        with self._checkout() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(_SELECT_ALL_PEERS_SQL)
+
+            return [dict(row) for row in cursor]
 
     def store_session(self, session_id: str, peer_id: str, session_key: bytes,
                      expires_at: float):
         """Store an ephemeral session key."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        with self._checkout() as conn:
+            cursor = conn.cursor()
 
-        created_at = datetime.now().timestamp()
+            created_at = _now()
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO sessions (session_id, peer_id, session_key, created_at, expires_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (session_id, peer_id, session_key, created_at, expires_at))
+            cursor.execute(_UPSERT_SESSION_SQL,
+                           (session_id, peer_id, session_key, created_at, expires_at))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def get_session(self, session_id: str) -> Optional[Dict]:
         """Get session information."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT session_id, peer_id, session_key, created_at, expires_at
-            FROM sessions
-            WHERE session_id = ?
-        ''', (session_id,))
-
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            return {
-                'session_id': row[0],
-                'peer_id': row[1],
-                'session_key': row[2],
-                'created_at': row[3],
-                'expires_at': row[4]
-            }
-        return None
-
-    def cleanup_expired_sessions(self):
-        """Remove expired session keys."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-
-        now = datetime.now().timestamp()
-        cursor.execute('DELETE FROM sessions WHERE expires_at < ?', (now,))
-
-        conn.commit()
-        conn.close()
+        with self._checkout() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(_SELECT_SESSION_SQL, (session_id,))
+
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def cleanup_expired_sessions(self) -> List[str]:
+        """Remove expired session keys. Returns the removed session IDs."""
+        with self._checkout() as conn:
+            cursor = conn.cursor()
+
+            now = _now()
+            cursor.execute(_SELECT_EXPIRED_SESSIONS_SQL, (now,))
+            expired = [row[0] for row in cursor.fetchall()]
+            cursor.execute(_DELETE_EXPIRED_SESSIONS_SQL, (now,))
+
+            conn.commit()
+
+            return expired
+
+    def maintenance_due(self) -> bool:
+        """Whether run_maintenance has work to do. Cheap: one stat() call."""
+        if _now() - self._last_maintenance >= self.MAINTENANCE_INTERVAL:
+            return True
+        try:
+            wal_size = self.db_path.with_name(self.db_path.name + '-wal').stat().st_size
+        except OSError:
+            return False
+        return wal_size > self.WAL_MAX_BYTES
+
+    def run_maintenance(self, force: bool = False) -> bool:
+        """
+        Release free pages and truncate the -wal file so neither grows without
+        bound. Blocks on disk I/O, so call it off the GUI thread.
+        Returns False if it was not due (or already running elsewhere).
+        """
+        if not self._maintenance_lock.acquire(blocking=False):
+            return False
+        try:
+            if not (force or self.maintenance_due()):
+                return False
+
+            with self._checkout() as conn:
+                conn.execute('PRAGMA incremental_vacuum').fetchall()
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            self._last_maintenance = _now()
+            return True
+        finally:
+            self._maintenance_lock.release()
 
     def update_peer_last_seen(self, peer_id: str):
         """Update last seen timestamp for a peer."""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
+        with self._checkout() as conn:
+            cursor = conn.cursor()
 
-        timestamp = datetime.now().timestamp()
-        cursor.execute('UPDATE peers SET last_seen = ? WHERE peer_id = ?', (timestamp, peer_id))
+            timestamp = _now()
+            cursor.execute(_UPDATE_LAST_SEEN_SQL, (timestamp, peer_id))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
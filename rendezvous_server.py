@@ -18,33 +18,134 @@ Usage:
 Default: http://0.0.0.0:8080
 """
 
+import asyncio
+import heapq
 import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
 import time
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple, Union
 import argparse
+from collections import OrderedDict
+
+logger = logging.getLogger('rendezvous')
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used without it
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # Optional speedup; the stdlib event loop is used without it
+    uvloop = None
+
+
+def _dumps(data) -> bytes:
+    """Serialize a response body to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+
+def _loads(body: bytes):
+    """Parse a JSON request body (orjson reads the bytes directly)."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body.decode('utf-8'))
+
+
+# Device IDs are UUIDs; anything outside this shape is refused before it can
+# become a registry key
+_DEVICE_ID_RE = re.compile(r'[0-9A-Za-z_-]{8,64}')
+
+
+def _device_id(value) -> Optional[str]:
+    """Return a well-formed device ID, interned, or None."""
+    if isinstance(value, str) and _DEVICE_ID_RE.fullmatch(value):
+        return sys.intern(value)
+    return None
+
+
+# Bodies that never change, serialized once. Health checks and probes of
+# unknown paths are answered without building or encoding a dict.
+_ROOT_BODY = _dumps({
+    'service': 'Ghostline Signal Rendezvous Server',
+    'status': 'running',
+    'api_endpoint': '/api',
+    'stats_endpoint': '/stats'
+})
+_HEALTH_BODY = _dumps({'status': 'ok'})
+_NOT_FOUND_BODY = _dumps({'error': 'Not found'})
+
+
+class _DeviceRecord:
+    """One registered device. Slots instead of a dict keep each entry small."""
+
+    __slots__ = ('device_id', 'public_addr', 'local_addr', 'last_seen', 'registered_at')
+
+    def __init__(self, device_id: str, public_addr: dict, local_addr: Optional[dict], now: float):
+        self.device_id = device_id
+        self.public_addr = public_addr
+        self.local_addr = local_addr
+        self.last_seen = now
+        self.registered_at = now
+
+    def info(self) -> dict:
+        """Connection info as sent to other devices."""
+        return {
+            'device_id': self.device_id,
+            'public_addr': self.public_addr,
+            'local_addr': self.local_addr
+        }
 
 
 class DeviceRegistry:
     """In-memory registry of devices and their connection info."""
 
-    def __init__(self, expiration_seconds: int = 300):
+    MAX_LONG_POLL = 25  # Longest a get_connect_requests call may wait (seconds)
+    STATS_TTL = 1.0  # Reuse computed stats for this long (seconds)
+    CLEANUP_INTERVAL = 15 * 60  # Safety-net sweep for an idle server (seconds)
+
+    def __init__(self, expiration_seconds: int = 300, max_devices: int = 100000):
         """
         Initialize device registry.
 
         Args:
             expiration_seconds: Time before registration expires (default: 5 minutes)
+            max_devices: Most devices held at once; registering past this evicts
+                the least recently seen device (default: 100000)
         """
-        self.devices: Dict[str, dict] = {}
+        # Kept in last_seen order (oldest first), so expiry and eviction only
+        # ever have to look at the front of the dict
+        self.devices: 'OrderedDict[str, _DeviceRecord]' = OrderedDict()
         self.expiration_seconds = expiration_seconds
-        self.lock = threading.Lock()
+        self.max_devices = max_devices
+        self.evicted_devices = 0  # Devices dropped for room, not for expiry
+        self.lock = threading.Lock()  # Guards devices only
 
         # Connection requests for coordinated NAT traversal
-        # Format: {target_device_id: [{requester_id, requester_info, timestamp}, ...]}
-        self.connect_requests: Dict[str, list] = {}
+        # Format: {target_device_id: {requester_id: (added_at, {requester_id, requester_info, timestamp})}}
+        # Each inner dict is in added_at order, oldest first.
+        # Guarded by requests_lock, so heartbeats and lookups never queue
+        # behind connect-request traffic or long-poll wakeups
+        self.connect_requests: Dict[str, 'OrderedDict[str, dict]'] = {}
+        self.requests_lock = threading.Lock()
+        self.pending_requests = 0
         self.request_expiration = 30  # Connection requests expire after 30 seconds
+        # (expires_at, target_id) per added request, so cleanup only visits
+        # targets that have something to expire. Entries for requests that
+        # were replaced or cleared are skipped when they come off the heap.
+        self._request_expiry: list = []
+        self.requests_changed = threading.Condition(self.requests_lock)  # Wakes long-polls
+        self._stats_cache = (0.0, None)  # (computed at, stats dict)
 
         # Start cleanup thread
         self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
@@ -53,39 +154,42 @@ class DeviceRegistry:
     def register(self, device_id: str, public_addr: dict, local_addr: dict = None) -> bool:
         """Register or update a device."""
         with self.lock:
-            self.devices[device_id] = {
-                'device_id': device_id,
-                'public_addr': public_addr,
-                'local_addr': local_addr,
-                'last_seen': time.time(),
-                'registered_at': self.devices.get(device_id, {}).get('registered_at', time.time())
-            }
+            now = time.monotonic()
+            device = self.devices.get(device_id)
+            if device is None:
+                self.devices[device_id] = _DeviceRecord(device_id, public_addr, local_addr, now)
+                if len(self.devices) > self.max_devices:
+                    self.devices.popitem(last=False)
+                    self.evicted_devices += 1
+            else:
+                device.public_addr = public_addr
+                device.local_addr = local_addr
+                device.last_seen = now
+                self.devices.move_to_end(device_id)
+            self._expire_devices(now)
             return True
 
     def lookup(self, device_id: str) -> Optional[dict]:
         """Look up a device's connection info."""
+        # Read-only: a lapsed entry is left for the next register/heartbeat
+        # to drop, so the lock is only held for the dict lookup and the copy
+        cutoff = time.monotonic() - self.expiration_seconds
         with self.lock:
             device = self.devices.get(device_id)
-            if device:
-                # Check if expired
-                age = time.time() - device['last_seen']
-                if age > self.expiration_seconds:
-                    del self.devices[device_id]
-                    return None
-                return {
-                    'device_id': device['device_id'],
-                    'public_addr': device['public_addr'],
-                    'local_addr': device['local_addr']
-                }
-            return None
+            if device is None or device.last_seen < cutoff:
+                return None
+            return device.info()
 
     def heartbeat(self, device_id: str) -> bool:
         """Update last_seen timestamp for a device."""
         with self.lock:
-            if device_id in self.devices:
-                self.devices[device_id]['last_seen'] = time.time()
-                return True
-            return False
+            now = time.monotonic()
+            found = device_id in self.devices
+            if found:
+                self.devices[device_id].last_seen = now
+                self.devices.move_to_end(device_id)
+            self._expire_devices(now)
+            return found
 
     def unregister(self, device_id: str) -> bool:
         """Unregister a device."""
@@ -98,19 +202,26 @@ class DeviceRegistry:
     def get_stats(self) -> dict:
         """Get server statistics."""
         with self.lock:
-            now = time.time()
-            active_devices = sum(
-                1 for d in self.devices.values()
-                if (now - d['last_seen']) <= self.expiration_seconds
-            )
-            pending_requests = sum(len(reqs) for reqs in self.connect_requests.values())
-            return {
+            now = time.monotonic()
+            computed_at, cached = self._stats_cache
+            if cached is not None and now - computed_at < self.STATS_TTL:
+                return cached
+
+            stale = 0
+            for device in self.devices.values():
+                if (now - device.last_seen) <= self.expiration_seconds:
+                    break
+                stale += 1
+            stats = {
                 'total_registered': len(self.devices),
-                'active_devices': active_devices,
-                'pending_requests': pending_requests,
+                'active_devices': len(self.devices) - stale,
+                'pending_requests': self.pending_requests,  # A snapshot; lives under requests_lock
+                'evicted_devices': self.evicted_devices,
                 'expiration_seconds': self.expiration_seconds,
                 'uptime': int(now - getattr(self, 'start_time', now))
             }
+            self._stats_cache = (now, stats)
+            return stats
 
     def add_connect_request(self, requester_id: str, target_id: str) -> Optional[dict]:
         """
@@ -118,13 +229,9 @@ class DeviceRegistry:
         Returns the target's device info if found, None otherwise.
         """
         with self.lock:
-            # Check if target is registered
+            # Check if target is registered and not expired
             target_info = self.devices.get(target_id)
-            if not target_info:
-                return None
-
-            # Check if expired
-            if time.time() - target_info['last_seen'] > self.expiration_seconds:
+            if target_info is None or target_info.last_seen < time.monotonic() - self.expiration_seconds:
                 return None
 
             # Get requester info
@@ -132,307 +239,569 @@ class DeviceRegistry:
             if not requester_info:
                 return None
 
-            # Add request
-            if target_id not in self.connect_requests:
-                self.connect_requests[target_id] = []
+            target = target_info.info()
+            requester = requester_info.info()
+
+        with self.requests_lock:
+            now = time.monotonic()  # Taken under the lock so requests stay in added_at order
+            requests = self.connect_requests.setdefault(target_id, OrderedDict())
 
-            # Remove any existing request from this requester
-            self.connect_requests[target_id] = [
-                r for r in self.connect_requests[target_id]
-                if r['requester_id'] != requester_id
-            ]
+            # Replace any existing request from this requester
+            if requests.pop(requester_id, None) is None:
+                self.pending_requests += 1
 
-            # Add new request
-            self.connect_requests[target_id].append({
+            # Add new request (newest goes last)
+            requests[requester_id] = (now, {
                 'requester_id': requester_id,
-                'requester_info': {
-                    'device_id': requester_id,
-                    'public_addr': requester_info['public_addr'],
-                    'local_addr': requester_info['local_addr']
-                },
-                'timestamp': time.time()
+                'requester_info': requester,
+                'timestamp': time.time()  # Wall clock, for the client
             })
+            heapq.heappush(self._request_expiry, (now + self.request_expiration, target_id))
+            self._expire_due_requests(now)
+            self.requests_changed.notify_all()
 
-            return {
-                'device_id': target_id,
-                'public_addr': target_info['public_addr'],
-                'local_addr': target_info['local_addr']
-            }
-
-    def get_connect_requests(self, device_id: str) -> list:
-        """Get pending connection requests for a device."""
-        with self.lock:
-            now = time.time()
-            requests = self.connect_requests.get(device_id, [])
-
-            # Filter out expired requests
-            valid_requests = [
-                r for r in requests
-                if now - r['timestamp'] < self.request_expiration
-            ]
+        return target
 
-            # Update stored requests
-            if valid_requests:
-                self.connect_requests[device_id] = valid_requests
-            elif device_id in self.connect_requests:
-                del self.connect_requests[device_id]
+    def get_connect_requests(self, device_id: str, wait: float = 0) -> list:
+        """
+        Get pending connection requests for a device.
+        If there are none, wait up to `wait` seconds (capped at MAX_LONG_POLL)
+        for one to arrive.
+        """
+        deadline = time.monotonic() + min(max(wait, 0), self.MAX_LONG_POLL)
+        with self.requests_lock:
+            while True:
+                now = time.monotonic()
+                self._expire_requests(device_id, now)
+                requests = self.connect_requests.get(device_id)
 
-            return valid_requests
+                if requests or now >= deadline:
+                    return [request for _, request in requests.values()] if requests else []
+                self.requests_changed.wait(deadline - now)
 
     def clear_connect_request(self, target_id: str, requester_id: str) -> bool:
         """Clear a specific connection request."""
-        with self.lock:
-            if target_id in self.connect_requests:
-                original_len = len(self.connect_requests[target_id])
-                self.connect_requests[target_id] = [
-                    r for r in self.connect_requests[target_id]
-                    if r['requester_id'] != requester_id
-                ]
-                if not self.connect_requests[target_id]:
-                    del self.connect_requests[target_id]
-                return len(self.connect_requests.get(target_id, [])) < original_len
-            return False
+        with self.requests_lock:
+            requests = self.connect_requests.get(target_id)
+            if requests is None or requests.pop(requester_id, None) is None:
+                return False
+            self.pending_requests -= 1
+            if not requests:
+                del self.connect_requests[target_id]
+            return True
+
+    def _expire_devices(self, now: float) -> int:
+        """Drop devices whose heartbeat has lapsed. Caller must hold the lock."""
+        expired = 0
+        while self.devices:
+            device = next(iter(self.devices.values()))
+            if (now - device.last_seen) <= self.expiration_seconds:
+                break
+            self.devices.popitem(last=False)
+            expired += 1
+        return expired
+
+    def _expire_requests(self, target_id: str, now: float) -> int:
+        """Drop a target's stale connection requests. Caller must hold requests_lock."""
+        requests = self.connect_requests.get(target_id)
+        if requests is None:
+            return 0
+        expired = 0
+        while requests:
+            added_at, _ = next(iter(requests.values()))
+            if now - added_at < self.request_expiration:
+                break
+            requests.popitem(last=False)
+            expired += 1
+        self.pending_requests -= expired
+        if not requests:
+            del self.connect_requests[target_id]
+        return expired
+
+    def _expire_due_requests(self, now: float) -> int:
+        """Drop every connection request that is due. Caller must hold requests_lock."""
+        expired = 0
+        heap = self._request_expiry
+        while heap and heap[0][0] <= now:
+            _, target_id = heapq.heappop(heap)
+            expired += self._expire_requests(target_id, now)
+        return expired
 
     def _cleanup_loop(self):
-        """Periodically remove expired devices and connection requests."""
+        """
+        Safety-net sweep for expired devices and connection requests.
+        register, heartbeat and add_connect_request already expire entries as
+        they go, so this only has work to do when the server has gone quiet.
+        """
+        evicted_logged = 0
         while True:
-            time.sleep(60)  # Check every minute
-            with self.lock:
-                now = time.time()
+            time.sleep(self.CLEANUP_INTERVAL)
+            now = time.monotonic()
 
+            with self.lock:
                 # Clean up expired devices
-                expired = [
-                    device_id for device_id, device in self.devices.items()
-                    if (now - device['last_seen']) > self.expiration_seconds
-                ]
-                for device_id in expired:
-                    del self.devices[device_id]
+                expired = self._expire_devices(now)
+                evicted = self.evicted_devices
 
-                if expired:
-                    print(f"[Cleanup] Removed {len(expired)} expired device(s)")
+            if expired:
+                logger.info("[Cleanup] Removed %d expired device(s)", expired)
+            if evicted != evicted_logged:
+                logger.warning("[Cleanup] Evicted %d device(s) to stay within max_devices=%d",
+                               evicted - evicted_logged, self.max_devices)
+                evicted_logged = evicted
 
+            with self.requests_lock:
                 # Clean up expired connection requests
-                expired_requests = 0
-                for target_id in list(self.connect_requests.keys()):
-                    original_len = len(self.connect_requests[target_id])
-                    self.connect_requests[target_id] = [
-                        r for r in self.connect_requests[target_id]
-                        if now - r['timestamp'] < self.request_expiration
-                    ]
-                    expired_requests += original_len - len(self.connect_requests[target_id])
-                    if not self.connect_requests[target_id]:
-                        del self.connect_requests[target_id]
+                expired_requests = self._expire_due_requests(now)
 
-                if expired_requests:
-                    print(f"[Cleanup] Removed {expired_requests} expired connection request(s)")
+            if expired_requests:
+                logger.info("[Cleanup] Removed %d expired connection request(s)", expired_requests)
 
 
-class RendezvousHandler(BaseHTTPRequestHandler):
-    """HTTP request handler for rendezvous server."""
+class RendezvousAPI:
+    """
+    Rendezvous API logic, independent of the HTTP server in front of it.
+    Every handler returns (status code, response body).
+    """
 
     # Class variable to hold the registry
     registry: DeviceRegistry = None
 
-    def do_GET(self):
+    API_PATHS = ('/api', '/api/batch')
+    KEEPALIVE_TIMEOUT = 75  # Close idle keep-alive connections after this (seconds)
+    MAX_BODY = 64 * 1024  # Largest accepted POST body; a single call is a few hundred bytes
+    LISTEN_BACKLOG = 2048  # Pending connections the kernel queues during a reconnect storm
+
+    def _handle_get(self, path: str) -> Tuple[int, Union[dict, bytes]]:
         """Handle GET requests (stats, health check)."""
-        parsed = urlparse(self.path)
-
-        if parsed.path == '/':
-            self._send_response(200, {
-                'service': 'Ghostline Signal Rendezvous Server',
-                'status': 'running',
-                'api_endpoint': '/api',
-                'stats_endpoint': '/stats'
-            })
+        if path == '/':
+            return (200, _ROOT_BODY)
 
-        elif parsed.path == '/stats':
-            stats = self.registry.get_stats()
-            self._send_response(200, stats)
+        elif path == '/stats':
+            return (200, self.registry.get_stats())
 
-        elif parsed.path == '/health':
-            self._send_response(200, {'status': 'ok'})
+        elif path == '/health':
+            return (200, _HEALTH_BODY)
 
         else:
-            self._send_response(404, {'error': 'Not found'})
+            return (404, _NOT_FOUND_BODY)
 
-    def do_POST(self):
-        """Handle POST requests (API calls)."""
-        if self.path != '/api':
-            self._send_response(404, {'error': 'Not found'})
-            return
+    def _body_length(self, value: Optional[str]) -> Tuple[Optional[int], Optional[Tuple[int, dict]]]:
+        """
+        Check a Content-Length header before any of the body is read.
+        Returns (length, None), or (None, error response) if it is invalid or too large.
+        """
+        if not value:
+            return (0, None)
+        if not (value.isascii() and value.isdigit()):
+            return (None, (400, {'error': 'Invalid Content-Length'}))
+        length = int(value)
+        if length > self.MAX_BODY:
+            return (None, (413, {'error': 'Request body too large'}))
+        return (length, None)
+
+    @staticmethod
+    def _parse_request(body: bytes) -> Optional[dict]:
+        """Decode a POST body, returning None if it isn't a JSON object."""
+        try:
+            request = _loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+        return request if isinstance(request, dict) else None
 
-        # Read request body
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length)
+    @staticmethod
+    def _batch_actions(request) -> Optional[list]:
+        """Return the calls in a /api/batch request, or None if it is malformed."""
+        actions = request.get('batch') if isinstance(request, dict) else None
+        return actions if isinstance(actions, list) else None
 
-        try:
-            request = json.loads(body.decode('utf-8'))
-        except json.JSONDecodeError:
-            self._send_response(400, {'error': 'Invalid JSON'})
-            return
+    def _handle_batch(self, request: dict) -> Tuple[int, dict]:
+        """Handle several API calls sent in one request, answering them in order."""
+        actions = self._batch_actions(request)
 
-        action = request.get('action')
+        if actions is None:
+            return (400, {'error': 'Missing batch'})
 
-        if action == 'register':
-            self._handle_register(request)
-        elif action == 'lookup':
-            self._handle_lookup(request)
-        elif action == 'heartbeat':
-            self._handle_heartbeat(request)
-        elif action == 'unregister':
-            self._handle_unregister(request)
-        elif action == 'connect_request':
-            self._handle_connect_request(request)
-        elif action == 'get_connect_requests':
-            self._handle_get_connect_requests(request)
-        elif action == 'clear_connect_request':
-            self._handle_clear_connect_request(request)
-        else:
-            self._send_response(400, {'error': 'Unknown action'})
+        responses = []
+        for action_request in actions:
+            if isinstance(action_request, dict):
+                responses.append(self._handle_action(action_request)[1])
+            else:
+                responses.append({'error': 'Invalid request'})
+
+        return (200, {'status': 'ok', 'responses': responses})
+
+    def _handle_action(self, request: dict) -> Tuple[int, dict]:
+        """Run a single API call and return (status code, response body)."""
+        action = request.get('action')
+        handler = self._ACTIONS.get(action) if isinstance(action, str) else None
+        if handler is None:
+            return (400, {'error': 'Unknown action'})
+        return handler(self, request)
 
-    def _handle_register(self, request: dict):
+    def _handle_register(self, request: dict) -> Tuple[int, dict]:
         """Handle device registration."""
-        device_id = request.get('device_id')
+        device_id = _device_id(request.get('device_id'))
         public_addr = request.get('public_addr')
 
         if not device_id or not public_addr:
-            self._send_response(400, {'error': 'Missing device_id or public_addr'})
-            return
+            return (400, {'error': 'Missing or invalid device_id, or missing public_addr'})
 
         local_addr = request.get('local_addr')
 
         success = self.registry.register(device_id, public_addr, local_addr)
 
         if success:
-            print(f"[Register] Device: {device_id[:8]}... @ {public_addr.get('ip')}:{public_addr.get('port')}")
-            self._send_response(200, {
+            logger.debug("[Register] Device: %.8s... @ %s:%s", device_id, public_addr.get('ip'), public_addr.get('port'))
+            return (200, {
                 'status': 'ok',
                 'message': 'Device registered',
                 'device_id': device_id
             })
         else:
-            self._send_response(500, {'error': 'Registration failed'})
+            return (500, {'error': 'Registration failed'})
 
-    def _handle_lookup(self, request: dict):
+    def _handle_lookup(self, request: dict) -> Tuple[int, dict]:
         """Handle device lookup."""
-        device_id = request.get('device_id')
+        device_id = _device_id(request.get('device_id'))
 
         if not device_id:
-            self._send_response(400, {'error': 'Missing device_id'})
-            return
+            return (400, {'error': 'Missing or invalid device_id'})
 
         device_info = self.registry.lookup(device_id)
 
         if device_info:
-            print(f"[Lookup] Device: {device_id[:8]}... found")
-            self._send_response(200, {
+            logger.debug("[Lookup] Device: %.8s... found", device_id)
+            return (200, {
                 'status': 'ok',
                 'device_info': device_info
             })
         else:
-            print(f"[Lookup] Device: {device_id[:8]}... not found")
-            self._send_response(404, {
+            logger.debug("[Lookup] Device: %.8s... not found", device_id)
+            return (404, {
                 'status': 'not_found',
                 'error': 'Device not found or expired'
             })
 
-    def _handle_heartbeat(self, request: dict):
+    def _handle_heartbeat(self, request: dict) -> Tuple[int, dict]:
         """Handle heartbeat."""
-        device_id = request.get('device_id')
+        device_id = _device_id(request.get('device_id'))
 
         if not device_id:
-            self._send_response(400, {'error': 'Missing device_id'})
-            return
+            return (400, {'error': 'Missing or invalid device_id'})
 
         success = self.registry.heartbeat(device_id)
 
         if success:
-            self._send_response(200, {'status': 'ok'})
+            return (200, {'status': 'ok'})
         else:
-            self._send_response(404, {'error': 'Device not registered'})
+            return (404, {'error': 'Device not registered'})
 
-    def _handle_unregister(self, request: dict):
+    def _handle_unregister(self, request: dict) -> Tuple[int, dict]:
         """Handle device unregistration."""
-        device_id = request.get('device_id')
+        device_id = _device_id(request.get('device_id'))
 
         if not device_id:
-            self._send_response(400, {'error': 'Missing device_id'})
-            return
+            return (400, {'error': 'Missing or invalid device_id'})
 
         success = self.registry.unregister(device_id)
 
         if success:
-            print(f"[Unregister] Device: {device_id[:8]}...")
-            self._send_response(200, {'status': 'ok'})
+            logger.debug("[Unregister] Device: %.8s...", device_id)
+            return (200, {'status': 'ok'})
         else:
-            self._send_response(404, {'error': 'Device not registered'})
+            return (404, {'error': 'Device not registered'})
 
-    def _handle_connect_request(self, request: dict):
+    def _handle_connect_request(self, request: dict) -> Tuple[int, dict]:
         """Handle connection request (for coordinated NAT traversal)."""
-        requester_id = request.get('requester_id')
-        target_id = request.get('target_id')
+        requester_id = _device_id(request.get('requester_id'))
+        target_id = _device_id(request.get('target_id'))
 
         if not requester_id or not target_id:
-            self._send_response(400, {'error': 'Missing requester_id or target_id'})
-            return
+            return (400, {'error': 'Missing or invalid requester_id or target_id'})
 
         target_info = self.registry.add_connect_request(requester_id, target_id)
 
         if target_info:
-            print(f"[ConnectRequest] {requester_id[:8]}... -> {target_id[:8]}...")
-            self._send_response(200, {
+            logger.debug("[ConnectRequest] %.8s... -> %.8s...", requester_id, target_id)
+            return (200, {
                 'status': 'ok',
                 'target_info': target_info
             })
         else:
-            self._send_response(404, {
+            return (404, {
                 'status': 'not_found',
                 'error': 'Target device not found or requester not registered'
             })
 
-    def _handle_get_connect_requests(self, request: dict):
+    def _handle_get_connect_requests(self, request: dict) -> Tuple[int, dict]:
         """Handle getting pending connection requests."""
-        device_id = request.get('device_id')
+        device_id = _device_id(request.get('device_id'))
 
         if not device_id:
-            self._send_response(400, {'error': 'Missing device_id'})
-            return
+            return (400, {'error': 'Missing or invalid device_id'})
 
-        requests = self.registry.get_connect_requests(device_id)
+        # Clients may long-poll: hold the response until a request arrives
+        requests = self.registry.get_connect_requests(device_id, self._long_poll_wait(request))
 
         if requests:
-            print(f"[GetRequests] {device_id[:8]}... has {len(requests)} pending request(s)")
+            logger.debug("[GetRequests] %.8s... has %d pending request(s)", device_id, len(requests))
 
-        self._send_response(200, {
+        return (200, {
             'status': 'ok',
             'requests': requests
         })
 
-    def _handle_clear_connect_request(self, request: dict):
+    def _handle_clear_connect_request(self, request: dict) -> Tuple[int, dict]:
         """Handle clearing a connection request."""
-        target_id = request.get('target_id')
-        requester_id = request.get('requester_id')
+        target_id = _device_id(request.get('target_id'))
+        requester_id = _device_id(request.get('requester_id'))
 
         if not target_id or not requester_id:
-            self._send_response(400, {'error': 'Missing target_id or requester_id'})
-            return
+            return (400, {'error': 'Missing or invalid target_id or requester_id'})
 
         success = self.registry.clear_connect_request(target_id, requester_id)
-        self._send_response(200, {'status': 'ok', 'cleared': success})
+        return (200, {'status': 'ok', 'cleared': success})
+
+    # Action name -> handler, looked up once per call instead of an if/elif chain
+    _ACTIONS = {
+        'register': _handle_register,
+        'lookup': _handle_lookup,
+        'heartbeat': _handle_heartbeat,
+        'unregister': _handle_unregister,
+        'connect_request': _handle_connect_request,
+        'get_connect_requests': _handle_get_connect_requests,
+        'clear_connect_request': _handle_clear_connect_request,
+    }
+
+    def _long_poll_wait(self, request: dict) -> float:
+        """How long a get_connect_requests call asked to wait, within limits."""
+        try:
+            wait = float(request.get('wait', 0))
+        except (TypeError, ValueError):
+            wait = 0
+        return min(max(wait, 0), self.registry.MAX_LONG_POLL)
+
+    @staticmethod
+    def _encode_response(status_code: int, data: Union[dict, bytes], keep_alive: bool) -> bytes:
+        """Serialize a complete JSON response, headers included. Bytes are sent as-is."""
+        body = data if isinstance(data, bytes) else _dumps(data)
+        head = (
+            f"HTTP/1.1 {status_code} {HTTPStatus(status_code).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        )
+        return head.encode('latin-1') + body
+
+
+class RendezvousHandler(RendezvousAPI, BaseHTTPRequestHandler):
+    """Thread-per-connection HTTP handler (used with --threaded)."""
+
+    # HTTP/1.1 keeps the connection open between requests unless the client
+    # asks to close it, so heartbeats don't pay for a new TCP handshake
+    protocol_version = 'HTTP/1.1'
+    timeout = RendezvousAPI.KEEPALIVE_TIMEOUT
+    # Small responses go out at once instead of waiting on the client's delayed ACK
+    disable_nagle_algorithm = True
 
-    def _send_response(self, status_code: int, data: dict):
-        """Send JSON response."""
-        self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+    def do_GET(self):
+        """Handle GET requests (stats, health check)."""
+        self._send_response(*self._handle_get(urlparse(self.path).path))
+
+    def do_POST(self):
+        """Handle POST requests (API calls)."""
+        if self.path not in self.API_PATHS:
+            self._send_response(404, _NOT_FOUND_BODY)
+            return
+
+        # Read request body, refusing oversized ones before reading them
+        content_length, error = self._body_length(self.headers.get('Content-Length'))
+        if error is not None:
+            # The unread body would be taken for the next request
+            self.close_connection = True
+            self._send_response(*error)
+            return
+        request = self._parse_request(self.rfile.read(content_length))
+
+        if request is None:
+            self._send_response(400, {'error': 'Request body must be a JSON object'})
+        elif self.path == '/api/batch':
+            self._send_response(*self._handle_batch(request))
+        else:
+            self._send_response(*self._handle_action(request))
+
+    def _send_response(self, status_code: int, data: Union[dict, bytes]):
+        """Send JSON response, status line to body in a single write."""
+        self.log_request(status_code)
+        self.wfile.write(self._encode_response(status_code, data, not self.close_connection))
 
     def log_message(self, format, *args):
         """Suppress default logging (we have custom logging)."""
         pass
 
 
+class RendezvousHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with a listen backlog sized for heartbeat bursts."""
+
+    request_queue_size = RendezvousAPI.LISTEN_BACKLOG
+
+
+class AsyncRendezvousServer(RendezvousAPI):
+    """
+    Single-threaded asyncio HTTP/1.1 server for the rendezvous API.
+
+    Every connection is just a socket on one event loop, so thousands of
+    idle keep-alive clients and parked long-polls cost no threads. Registry
+    calls are short and run inline; long-polls wait on an asyncio.Condition
+    that is notified whenever a connect_request is added.
+    """
+
+    MAX_HEADERS = 100
+
+    def __init__(self, registry: DeviceRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.requests_changed: Optional[asyncio.Condition] = None
+
+    async def serve_forever(self):
+        """Accept connections until cancelled."""
+        self.requests_changed = asyncio.Condition()
+        # asyncio already sets TCP_NODELAY on every accepted TCP socket
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                            backlog=self.LISTEN_BACKLOG)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until either side closes it."""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+
+                parts = request_line.decode('latin-1').split()
+                headers = await self._read_headers(reader)
+                if len(parts) != 3 or headers is None:
+                    writer.write(self._encode_response(400, {'error': 'Bad request'}, False))
+                    break
+                method, target, version = parts
+
+                connection = headers.get('connection', '').lower()
+                if version == 'HTTP/1.1':
+                    keep_alive = connection != 'close'
+                else:
+                    keep_alive = connection == 'keep-alive'
+
+                content_length, error = self._body_length(headers.get('content-length'))
+                if error is not None:
+                    writer.write(self._encode_response(*error, False))
+                    break
+
+                # Always consume the body so the next request on this connection lines up
+                body = await reader.readexactly(content_length)
+
+                path = urlparse(target).path
+                if method == 'GET':
+                    status, data = self._handle_get(path)
+                elif method == 'POST':
+                    status, data = await self._handle_post(path, body)
+                else:
+                    status, data = (501, {'error': 'Unsupported method'})
+
+                writer.write(self._encode_response(status, data, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> Optional[Dict[str, str]]:
+        """Read header lines up to the blank line; None if there are too many."""
+        headers = {}
+        for _ in range(self.MAX_HEADERS):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return None
+
+    async def _handle_post(self, path: str, body: bytes) -> Tuple[int, Union[dict, bytes]]:
+        """Handle POST requests (API calls)."""
+        if path not in self.API_PATHS:
+            return (404, _NOT_FOUND_BODY)
+
+        request = self._parse_request(body)
+        if request is None:
+            return (400, {'error': 'Request body must be a JSON object'})
+
+        if path != '/api/batch':
+            return await self._run_action(request)
+
+        actions = self._batch_actions(request)
+        if actions is None:
+            return (400, {'error': 'Missing batch'})
+
+        responses = []
+        for action_request in actions:
+            if isinstance(action_request, dict):
+                responses.append((await self._run_action(action_request))[1])
+            else:
+                responses.append({'error': 'Invalid request'})
+        return (200, {'status': 'ok', 'responses': responses})
+
+    async def _run_action(self, request: dict) -> Tuple[int, dict]:
+        """Run one API call without ever blocking the event loop."""
+        action = request.get('action')
+
+        if action == 'get_connect_requests' and _device_id(request.get('device_id')):
+            # Long-poll on the loop instead of parking a thread in the registry
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self._long_poll_wait(request)
+            immediate = dict(request, wait=0)
+            while True:
+                status, data = self._handle_action(immediate)
+                remaining = deadline - loop.time()
+                if data.get('requests') or remaining <= 0:
+                    return (status, data)
+                async with self.requests_changed:
+                    try:
+                        await asyncio.wait_for(self.requests_changed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+
+        status, data = self._handle_action(request)
+        if action == 'connect_request' and status == 200:
+            async with self.requests_changed:
+                self.requests_changed.notify_all()
+        return (status, data)
+
+
+def enable_console_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Print server log lines to stderr from a background thread, so request
+    handlers only ever append to a queue. Returns the running listener.
+    """
+    log_queue: 'queue.Queue[logging.LogRecord]' = queue.Queue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(level)
+    listener.start()
+    return listener
+
+
 def main():
     """Run the rendezvous server."""
     parser = argparse.ArgumentParser(description='Ghostline Signal Rendezvous Server')
@@ -440,17 +809,29 @@ def main():
     parser.add_argument('--port', type=int, default=8080, help='Port to bind to (default: 8080)')
     parser.add_argument('--expiration', type=int, default=300,
                        help='Device expiration time in seconds (default: 300)')
+    parser.add_argument('--max-devices', type=int, default=100000,
+                       help='Most devices registered at once; the least recently seen is '
+                            'evicted past this (default: 100000)')
+    parser.add_argument('--threaded', action='store_true',
+                       help='Serve with one thread per connection instead of the asyncio event loop')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Log every register, lookup and connect request')
     args = parser.parse_args()
 
+    log_listener = enable_console_logging(logging.DEBUG if args.verbose else logging.INFO)
+
     # Create registry
-    registry = DeviceRegistry(expiration_seconds=args.expiration)
-    registry.start_time = time.time()
+    registry = DeviceRegistry(expiration_seconds=args.expiration, max_devices=args.max_devices)
+    registry.start_time = time.monotonic()
 
-    # Set registry on handler class
-    RendezvousHandler.registry = registry
+    if args.threaded:
+        # Set registry on handler class
+        RendezvousHandler.registry = registry
 
-    # Create server
-    server = HTTPServer((args.host, args.port), RendezvousHandler)
+        # Create server (one thread per connection, so long-polls don't block others)
+        server = RendezvousHTTPServer((args.host, args.port), RendezvousHandler)
+    else:
+        server = AsyncRendezvousServer(registry, args.host, args.port)
 
     print("=" * 60)
     print("Ghostline Signal Rendezvous Server")
@@ -471,10 +852,17 @@ def main():
     print()
 
     try:
-        server.serve_forever()
+        if args.threaded:
+            server.serve_forever()
+        else:
+            if uvloop is not None:
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            asyncio.run(server.serve_forever())
     except KeyboardInterrupt:
         print("\n\nShutting down...")
-        server.shutdown()
+        if args.threaded:
+            server.shutdown()
+        log_listener.stop()
         print("Server stopped.")
 
 
@@ -4,14 +4,36 @@ Ghostline Signal - Quick Run Script
 Installs dependencies if needed and starts the application.
 """
 
+import hashlib
 import subprocess
 import sys
+import time
 import importlib.util
 from pathlib import Path
 
+# The package __init__ imports nothing, so this is safe before the dependency check
+from ghostline_signal import __version__ as APP_VERSION
+
+# A successful check is remembered for this long per app version and
+# interpreter, so most launches skip it
+DEPS_CHECK_TTL = 7 * 24 * 3600
+
+
+def _deps_marker() -> Path:
+    """Marker file recording a passed dependency check for this interpreter."""
+    interpreter = hashlib.sha1(sys.executable.encode('utf-8')).hexdigest()[:12]
+    return Path.home() / '.ghostline_signal' / f'.deps_ok_{APP_VERSION}_{interpreter}'
+
 
 def check_and_install_dependencies():
     """Check for required packages and install if missing."""
+    marker = _deps_marker()
+    try:
+        if time.time() - marker.stat().st_mtime < DEPS_CHECK_TTL:
+            return True
+    except OSError:
+        pass
+
     dependencies = {
         'PySide6': 'PySide6>=6.6.0',
         'cryptography': 'cryptography>=41.0.0'
@@ -45,6 +67,12 @@ def check_and_install_dependencies():
     else:
         print("\nAll dependencies satisfied!")
 
+    try:
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    except OSError:
+        pass  # Only costs a re-check next launch
+
     return True
 
 
@@ -79,7 +107,7 @@ def main():
         app = QApplication(sys.argv)
         app.setApplicationName("Ghostline Signal")
         app.setOrganizationName("Ghostline")
-        app.setApplicationVersion("0.1.0")
+        app.setApplicationVersion(APP_VERSION)
 
         window = MainWindow()
         window.show()
@@ -88,6 +116,7 @@ def main():
 
     except ImportError as e:
         print(f"\n✗ Import Error: {e}")
+        _deps_marker().unlink(missing_ok=True)  # Check properly next launch
         print("\nTrying to reinstall dependencies...")
         subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--force-reinstall',
                               'PySide6', 'cryptography'])
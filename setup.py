@@ -2,6 +2,7 @@
 Setup script for Ghostline Signal.
 """
 
+import re
 from setuptools import setup, find_packages
 from pathlib import Path
 
@@ -15,9 +16,16 @@ if readme_file.exists():
 else:
     long_description = "Ghostline Signal - Peer-to-peer communication system with privacy and locality focus"
 
+# Read the version from the package without importing it
+version = re.search(
+    r'^__version__ = "([^"]+)"',
+    (here / "ghostline_signal" / "__init__.py").read_text(encoding="utf-8"),
+    re.MULTILINE,
+).group(1)
+
 setup(
     name="ghostline-signal",
-    version="0.1.0",
+    version=version,
     author="Ghostline",
     description="Peer-to-peer communication system with privacy and locality focus",
     long_description=long_description,